@@ -0,0 +1,79 @@
+"""create base tables
+
+Revision ID: 1c7e4b2a9f30
+Revises:
+Create Date: 2026-10-17 08:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c7e4b2a9f30'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _tables() -> set:
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    # The tables as the app first created them; later revisions add indexes and columns.
+    # Databases created by the app at startup already have them and are left as they are.
+    tables = _tables()
+    if "users" not in tables:
+        op.create_table(
+            "users",
+            sa.Column("user_id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("email", sa.String(100), nullable=False),
+            sa.Column("password_hash", sa.String(255), nullable=False),
+            sa.Column("full_name", sa.String(100), nullable=False),
+            sa.Column("phone_number", sa.String(15), nullable=False),
+            sa.Column("avatar_url", sa.String(255), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_users_user_id", "users", ["user_id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+    if "emergency_contacts" not in tables:
+        op.create_table(
+            "emergency_contacts",
+            sa.Column("contact_id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.user_id"), nullable=False),
+            sa.Column("name", sa.String(100), nullable=False),
+            sa.Column("phone_number", sa.String(15), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+        )
+        op.create_index("ix_emergency_contacts_contact_id", "emergency_contacts", ["contact_id"])
+    if "trips" not in tables:
+        op.create_table(
+            "trips",
+            sa.Column("trip_id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.user_id"), nullable=False),
+            sa.Column("start_time", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("end_time", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("status", sa.Enum("ONGOING", "FINISHED", name="tripstatus"), nullable=True),
+        )
+        op.create_index("ix_trips_trip_id", "trips", ["trip_id"])
+    if "detection_logs" not in tables:
+        op.create_table(
+            "detection_logs",
+            sa.Column("log_id", sa.BigInteger(), primary_key=True, autoincrement=True),
+            sa.Column("trip_id", sa.Integer(), sa.ForeignKey("trips.trip_id"), nullable=False),
+            sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("event_type", sa.String(50), nullable=False),
+            sa.Column("confidence", sa.Float(), nullable=False),
+            sa.Column("gps_location", sa.String(50), nullable=True),
+        )
+        op.create_index("ix_detection_logs_log_id", "detection_logs", ["log_id"])
+
+
+def downgrade() -> None:
+    tables = _tables()
+    for table in ("detection_logs", "trips", "emergency_contacts", "users"):
+        if table in tables:
+            op.drop_table(table)
@@ -0,0 +1,41 @@
+"""add statistics indexes
+
+Revision ID: 3f1c2a7d9b10
+Revises: 1c7e4b2a9f30
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a7d9b10'
+down_revision: Union[str, None] = '1c7e4b2a9f30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_trips_user_id_start_time", "trips", ["user_id", "start_time"]),
+    ("ix_detection_logs_trip_id_timestamp", "detection_logs", ["trip_id", "timestamp"]),
+    ("ix_detection_logs_trip_id_event_type", "detection_logs", ["trip_id", "event_type"]),
+]
+
+
+def _existing(table: str) -> set:
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    # Databases created by the app at startup may already have these indexes
+    for name, table, columns in INDEXES:
+        if name not in _existing(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in INDEXES:
+        if name in _existing(table):
+            op.drop_index(name, table_name=table)
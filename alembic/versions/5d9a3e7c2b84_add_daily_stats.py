@@ -0,0 +1,83 @@
+"""add daily_stats rollup table
+
+Revision ID: 5d9a3e7c2b84
+Revises: 8b2e6c4f1a57
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d9a3e7c2b84'
+down_revision: Union[str, None] = '8b2e6c4f1a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _tables() -> set:
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def _minutes(start, end):
+    # Whole minutes of a trip, like crud.minutes_between at the time of this revision
+    if op.get_bind().dialect.name == "sqlite":
+        seconds = lambda value: sa.cast(sa.func.strftime("%s", value), sa.Integer)
+        return (seconds(end) - seconds(start)) // 60
+    return sa.func.timestampdiff(sa.text("MINUTE"), start, end)
+
+
+def _backfill() -> None:
+    # Same rows as `python -m rollup rebuild`: one per user and trip start day with the
+    # trip count and minutes (event_type ""), plus one per event type with its detections
+    trips = sa.table(
+        "trips", sa.column("trip_id"), sa.column("user_id"),
+        sa.column("start_time", sa.DateTime()), sa.column("end_time", sa.DateTime()),
+    )
+    logs = sa.table("detection_logs", sa.column("trip_id"), sa.column("event_type"))
+    daily_stats = sa.table(
+        "daily_stats", sa.column("user_id"), sa.column("day"), sa.column("event_type"),
+        sa.column("detection_count"), sa.column("trip_count"), sa.column("driving_minutes"),
+    )
+    columns = ["user_id", "day", "event_type", "detection_count", "trip_count", "driving_minutes"]
+    day = sa.func.date(trips.c.start_time)
+
+    trip_rows = (
+        sa.select(
+            trips.c.user_id, day, sa.literal(""), sa.literal(0), sa.func.count(trips.c.trip_id),
+            sa.func.coalesce(sa.func.sum(_minutes(trips.c.start_time, trips.c.end_time)), 0),
+        )
+        .group_by(trips.c.user_id, day)
+    )
+    detection_rows = (
+        sa.select(trips.c.user_id, day, logs.c.event_type, sa.func.count(), sa.literal(0), sa.literal(0))
+        .select_from(logs.join(trips, logs.c.trip_id == trips.c.trip_id))
+        .group_by(trips.c.user_id, day, logs.c.event_type)
+    )
+    # The table may already hold rows written since the app created it at startup:
+    # recompute everything from the raw tables rather than adding to them
+    op.execute(sa.delete(daily_stats))
+    op.execute(daily_stats.insert().from_select(columns, trip_rows))
+    op.execute(daily_stats.insert().from_select(columns, detection_rows))
+
+
+def upgrade() -> None:
+    if "daily_stats" not in _tables():
+        op.create_table(
+            "daily_stats",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.user_id"), primary_key=True),
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("event_type", sa.String(50), primary_key=True),
+            sa.Column("detection_count", sa.Integer(), nullable=False),
+            sa.Column("trip_count", sa.Integer(), nullable=False),
+            sa.Column("driving_minutes", sa.Integer(), nullable=False),
+        )
+    _backfill()
+
+
+def downgrade() -> None:
+    if "daily_stats" in _tables():
+        op.drop_table("daily_stats")
@@ -0,0 +1,44 @@
+"""add detection log client_event_id
+
+Revision ID: 8b2e6c4f1a57
+Revises: 3f1c2a7d9b10
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e6c4f1a57'
+down_revision: Union[str, None] = '3f1c2a7d9b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX = "uq_detection_logs_trip_id_client_event_id"
+
+
+def _columns() -> set:
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns("detection_logs")}
+
+
+def _indexes() -> set:
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("detection_logs")}
+
+
+def upgrade() -> None:
+    # Databases created by the app at startup may already have the column and index
+    if "client_event_id" not in _columns():
+        op.add_column("detection_logs", sa.Column("client_event_id", sa.String(64), nullable=True))
+    if INDEX not in _indexes():
+        op.create_index(INDEX, "detection_logs", ["trip_id", "client_event_id"], unique=True)
+
+
+def downgrade() -> None:
+    if INDEX in _indexes():
+        op.drop_index(INDEX, table_name="detection_logs")
+    if "client_event_id" in _columns():
+        with op.batch_alter_table("detection_logs") as batch_op:
+            batch_op.drop_column("client_event_id")
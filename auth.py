@@ -1,3 +1,8 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -8,6 +13,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 import models, schemas
 from sqlalchemy import select
+from cache import MemoryCache
 
 # SECRET_KEY should be in .env in production
 SECRET_KEY = "YOUR_SECRET_KEY_KEEP_IT_SECRET" 
@@ -16,6 +22,17 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60 # 30 days for mobile app convenience
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/token")
 
+# Authenticated users are kept in memory so requests skip the user lookup.
+# Profile changes made by another API process show up after at most AUTH_CACHE_TTL_S.
+AUTH_CACHE_TTL_S = int(os.getenv("AUTH_CACHE_TTL_S", 60))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))
+principal_cache = MemoryCache(max_entries=AUTH_CACHE_MAX_ENTRIES)
+
+# Threads for bcrypt (it releases the GIL); each hash or check keeps one busy for ~100-300 ms
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+# How many password operations may wait for a thread before new ones are rejected with 503
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", 64))
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
@@ -23,6 +40,82 @@ def get_password_hash(password: str) -> str:
     salt = bcrypt.gensalt()
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool so a burst of logins never blocks
+    the event loop (and with it every WebSocket stream). The pool is bounded: past
+    the queue limit requests get 503 instead of piling up.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_size: int = PASSWORD_HASH_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def pending(self) -> int:
+        """Operations running or waiting for a thread."""
+        return self._pending
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self._wait_total / self.completed * 1000, 1) if self.completed else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 1),
+            }
+
+    def _run(self, submitted: float, fn, *args):
+        wait = time.monotonic() - submitted
+        with self._lock:
+            self._running += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many login requests, try again shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        future = self._pool.submit(self._run, time.monotonic(), fn, *args)
+        # Release the slot when the job ends or is cancelled before it started
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(get_password_hash, password)
+
+password_hasher = PasswordHasher()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -33,7 +126,15 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> schemas.Principal:
+    return await get_user_from_token(token, db)
+
+async def invalidate_principal(email: str):
+    """Drop a cached user, after their profile or password changed."""
+    await principal_cache.delete(email)
+
+async def get_user_from_token(token: str, db: AsyncSession):
+    # Also used by WebSocket endpoints, which get the token from the query string or a message
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -48,8 +149,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     except JWTError:
         raise credentials_exception
     
+    principal = await principal_cache.get(token_data.email) if AUTH_CACHE_TTL_S > 0 else None
+    if principal is not None:
+        return principal
+
     result = await db.execute(select(models.User).where(models.User.email == token_data.email))
     user = result.scalars().first()
     if user is None:
         raise credentials_exception
-    return user
+    principal = schemas.Principal.model_validate(user)
+    if AUTH_CACHE_TTL_S > 0:
+        await principal_cache.set(token_data.email, principal, AUTH_CACHE_TTL_S)
+    return principal
@@ -0,0 +1,113 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# memory:// keeps entries in this process; redis://host:6379/0 shares them between workers
+CACHE_URL = os.getenv("CACHE_URL", "memory://")
+# How long a cached response may be served (seconds); writes invalidate it earlier
+CACHE_TTL_S = int(os.getenv("CACHE_TTL_S", 300))
+# Entries kept by the in-process backend before the least recently used are evicted
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+
+
+class MemoryCache:
+    """In-process LRU cache with per-entry expiry. Counters are kept apart and never evicted."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+class RedisCache:
+    """Shared cache for several API workers. Requires `pip install redis`; eviction is left to Redis' maxmemory policy."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        await self._redis.set(key, value, ex=ttl)
+
+    async def delete(self, key: str):
+        await self._redis.delete(key)
+
+    async def get_counter(self, key: str) -> int:
+        return int(await self._redis.get(key) or 0)
+
+    async def incr(self, key: str) -> int:
+        return await self._redis.incr(key)
+
+
+def create_backend(url: str = CACHE_URL):
+    if url.startswith("memory://"):
+        return MemoryCache()
+    if url.startswith(("redis://", "rediss://")):
+        return RedisCache(url)
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
+
+
+class UserResponseCache:
+    """
+    Response bodies cached per user, endpoint and parameters.
+
+    Every key embeds the user's version counter, so invalidating a user is a single
+    increment: the old entries are never read again and age out through TTL/LRU.
+    """
+
+    def __init__(self, backend, namespace: str, ttl: int = CACHE_TTL_S):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _version_key(self, user_id: int) -> str:
+        return f"{self.namespace}:{user_id}:version"
+
+    async def key(self, user_id: int, endpoint: str, params: list) -> str:
+        version = await self.backend.get_counter(self._version_key(user_id))
+        query = "&".join(f"{name}={value}" for name, value in sorted(params))
+        return f"{self.namespace}:{user_id}:{version}:{endpoint}?{query}"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.backend.get(key)
+
+    async def set(self, key: str, body: bytes):
+        await self.backend.set(key, body, self.ttl)
+
+    async def invalidate(self, user_id: int):
+        await self.backend.incr(self._version_key(user_id))
+
+
+statistics_cache = UserResponseCache(create_backend(), "stats")
@@ -1,10 +1,31 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update
+from sqlalchemy import update, Integer
 from sqlalchemy.sql import func
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.ext.compiler import compiles
 import models, schemas
-from auth import get_password_hash
-from datetime import datetime
+from auth import invalidate_principal, password_hasher
+from cache import statistics_cache
+from datetime import datetime, date
+
+
+class minutes_between(FunctionElement):
+    # Whole minutes from start to end, truncated like int(timedelta.total_seconds() / 60)
+    type = Integer()
+    inherit_cache = True
+
+@compiles(minutes_between)
+def _minutes_between_mysql(element, compiler, **kw):
+    start, end = element.clauses
+    return "TIMESTAMPDIFF(MINUTE, %s, %s)" % (compiler.process(start, **kw), compiler.process(end, **kw))
+
+@compiles(minutes_between, "sqlite")
+def _minutes_between_sqlite(element, compiler, **kw):
+    start, end = element.clauses
+    return "((CAST(strftime('%%s', %s) AS INTEGER) - CAST(strftime('%%s', %s) AS INTEGER)) / 60)" % (
+        compiler.process(end, **kw), compiler.process(start, **kw)
+    )
 
 
 # --- User CRUD ---
@@ -13,7 +34,7 @@ async def get_user_by_email(db: AsyncSession, email: str):
     return result.scalars().first()
 
 async def create_user(db: AsyncSession, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     db_user = models.User(
         email=user.email,
         password_hash=hashed_password,
@@ -37,7 +58,10 @@ async def update_user(db: AsyncSession, user_id: int, user_update: schemas.UserU
     await db.commit()
     
     result = await db.execute(select(models.User).where(models.User.user_id == user_id))
-    return result.scalars().first()
+    user = result.scalars().first()
+    if user:
+        await invalidate_principal(user.email)
+    return user
 
 
 # --- Contact CRUD ---
@@ -94,7 +118,11 @@ async def delete_contact(db: AsyncSession, contact_id: int, user_id: int):
 async def create_trip(db: AsyncSession, user_id: int):
     db_trip = models.Trip(user_id=user_id, status=models.TripStatus.ONGOING)
     db.add(db_trip)
+    await db.flush()
+    await db.refresh(db_trip)
+    await add_daily_stats(db, user_id, db_trip.start_time.date(), trips=1)
     await db.commit()
+    await statistics_cache.invalidate(user_id)
     await db.refresh(db_trip)
     return db_trip
 
@@ -113,34 +141,103 @@ async def end_trip(db: AsyncSession, trip_id: int):
 
     query = (
         update(models.Trip)
-        .where(models.Trip.trip_id == trip_id)
+        .where(models.Trip.trip_id == trip_id, models.Trip.status == models.TripStatus.ONGOING)
         .values(status=models.TripStatus.FINISHED, end_time=func.now())
     )
-    await db.execute(query)
+    result = await db.execute(query)
+    if result.rowcount:
+        # Only the call that actually ended the trip adds its minutes to the rollup
+        result = await db.execute(
+            select(models.Trip).where(models.Trip.trip_id == trip_id).execution_options(populate_existing=True)
+        )
+        trip = result.scalars().first()
+        await add_daily_stats(db, trip.user_id, trip.start_time.date(), minutes=trip_minutes(trip))
     await db.commit()
     
     # Return updated trip
     result = await db.execute(select(models.Trip).where(models.Trip.trip_id == trip_id))
-    return result.scalars().first()
+    trip = result.scalars().first()
+    if trip:
+        await statistics_cache.invalidate(trip.user_id)
+    return trip
 
 # --- Log CRUD ---
 async def create_detection_log(db: AsyncSession, log: schemas.DetectionLogCreate, trip_id: int):
+    if log.client_event_id is not None:
+        # Replayed event: return the log stored the first time
+        result = await db.execute(
+            select(models.DetectionLog)
+            .where(models.DetectionLog.trip_id == trip_id, models.DetectionLog.client_event_id == log.client_event_id)
+        )
+        existing = result.scalars().first()
+        if existing:
+            return existing
     db_log = models.DetectionLog(**log.model_dump(), trip_id=trip_id)
     db.add(db_log)
+    result = await db.execute(
+        select(models.Trip.user_id, models.Trip.start_time).where(models.Trip.trip_id == trip_id)
+    )
+    trip = result.first()
+    if trip:
+        await add_daily_stats(db, trip.user_id, trip.start_time.date(), event_type=log.event_type, detections=1)
     await db.commit()
+    if trip:
+        await statistics_cache.invalidate(trip.user_id)
     await db.refresh(db_log)
     return db_log
 
-# --- Statistics CRUD ---
-async def get_user_trips(db: AsyncSession, user_id: int, limit: int = 10):
+async def _existing_client_event_ids(db: AsyncSession, rows: list, chunk: int = 1000):
+    keys = list({(row["trip_id"], row["client_event_id"]) for row in rows if row.get("client_event_id") is not None})
+    existing = set()
+    for i in range(0, len(keys), chunk):
+        part = keys[i:i + chunk]
+        result = await db.execute(
+            select(models.DetectionLog.trip_id, models.DetectionLog.client_event_id)
+            .where(models.DetectionLog.trip_id.in_({trip_id for trip_id, _ in part}))
+            .where(models.DetectionLog.client_event_id.in_({key for _, key in part}))
+        )
+        existing.update(result.tuples().all())
+    return existing
+
+async def create_detection_logs(db: AsyncSession, rows: list):
+    # Multi-row INSERT of log dicts (trip_id, event_type, confidence, gps_location, timestamp, client_event_id).
+    # Rows of unknown trips and already stored client_event_ids are skipped. Returns the number of rows written.
+    from collections import Counter
+    from sqlalchemy import insert
     result = await db.execute(
-        select(models.Trip)
-        .where(models.Trip.user_id == user_id)
-        .order_by(models.Trip.start_time.desc())
-        .limit(limit)
+        select(models.Trip.trip_id, models.Trip.user_id, models.Trip.start_time)
+        .where(models.Trip.trip_id.in_({row["trip_id"] for row in rows}))
     )
-    return result.scalars().all()
+    trips = {trip.trip_id: trip for trip in result.all()}
+    rows = [row for row in rows if row["trip_id"] in trips]
+
+    # First occurrence of a client_event_id wins, within the batch and against stored logs
+    seen = await _existing_client_event_ids(db, rows)
+    unique_rows = []
+    for row in rows:
+        key = row.get("client_event_id")
+        if key is not None:
+            if (row["trip_id"], key) in seen:
+                continue
+            seen.add((row["trip_id"], key))
+        unique_rows.append(row)
+    rows = unique_rows
+    if not rows:
+        return 0
 
+    await db.execute(insert(models.DetectionLog), rows)
+    # One rollup update per (user, day, event type) instead of one per log
+    counts = Counter(
+        (trips[row["trip_id"]].user_id, trips[row["trip_id"]].start_time.date(), row["event_type"]) for row in rows
+    )
+    for (user_id, day, event_type), count in counts.items():
+        await add_daily_stats(db, user_id, day, event_type=event_type, detections=count)
+    await db.commit()
+    for user_id in {user_id for user_id, _, _ in counts}:
+        await statistics_cache.invalidate(user_id)
+    return len(rows)
+
+# --- Statistics CRUD ---
 async def get_trip_logs(db: AsyncSession, trip_id: int):
     result = await db.execute(
         select(models.DetectionLog)
@@ -149,63 +246,127 @@ async def get_trip_logs(db: AsyncSession, trip_id: int):
     )
     return result.scalars().all()
 
-async def get_user_detection_count(db: AsyncSession, user_id: int):
-    # Count all detections across all user trips
+async def get_trips_with_detection_counts(db: AsyncSession, user_id: int, start_date: datetime = None, end_date: datetime = None, limit: int = None):
+    # Trips (newest first) with their detection counts, in one query instead of one count per trip.
+    # The count is correlated, so only the logs of the trips returned (range and limit applied) are counted.
     from sqlalchemy import func as sql_func
-    result = await db.execute(
-        select(sql_func.count(models.DetectionLog.log_id))
-        .join(models.Trip)
+    total = (
+        select(sql_func.count())
+        .where(models.DetectionLog.trip_id == models.Trip.trip_id)
+        .correlate(models.Trip)
+        .scalar_subquery()
+    )
+    query = (
+        select(models.Trip, total)
         .where(models.Trip.user_id == user_id)
+        .order_by(models.Trip.start_time.desc())
     )
-    return result.scalar() or 0
+    if start_date is not None:
+        query = query.where(models.Trip.start_time >= start_date)
+    if end_date is not None:
+        query = query.where(models.Trip.start_time <= end_date)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    return result.all()
+
+# --- Daily statistics rollup ---
+TRIP_EVENT = ""  # event_type of the rollup rows that hold trip count and driving minutes
+
+def trip_minutes(trip: models.Trip) -> int:
+    if not (trip.end_time and trip.start_time):
+        return 0
+    return int((trip.end_time - trip.start_time).total_seconds() / 60)
+
+async def add_daily_stats(db: AsyncSession, user_id: int, day: date, event_type: str = TRIP_EVENT,
+                          detections: int = 0, trips: int = 0, minutes: int = 0):
+    # Atomic increment of one rollup row, created on first use. Runs in the caller's transaction.
+    table = models.DailyStats.__table__
+    values = dict(user_id=user_id, day=day, event_type=event_type,
+                  detection_count=detections, trip_count=trips, driving_minutes=minutes)
+    if db.get_bind().dialect.name == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(**values)
+        stmt = stmt.on_duplicate_key_update(
+            detection_count=table.c.detection_count + stmt.inserted.detection_count,
+            trip_count=table.c.trip_count + stmt.inserted.trip_count,
+            driving_minutes=table.c.driving_minutes + stmt.inserted.driving_minutes,
+        )
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.day, table.c.event_type],
+            set_=dict(
+                detection_count=table.c.detection_count + stmt.excluded.detection_count,
+                trip_count=table.c.trip_count + stmt.excluded.trip_count,
+                driving_minutes=table.c.driving_minutes + stmt.excluded.driving_minutes,
+            ),
+        )
+    await db.execute(stmt)
 
-async def get_detection_breakdown(db: AsyncSession, user_id: int):
-    # Group by event_type
+async def get_daily_trip_totals(db: AsyncSession, user_id: int, start_day: date = None, end_day: date = None):
+    # (number of trips, driving minutes) from the rollup
     from sqlalchemy import func as sql_func
-    result = await db.execute(
-        select(models.DetectionLog.event_type, sql_func.count(models.DetectionLog.log_id))
-        .join(models.Trip)
-        .where(models.Trip.user_id == user_id)
-        .group_by(models.DetectionLog.event_type)
+    query = (
+        select(
+            sql_func.coalesce(sql_func.sum(models.DailyStats.trip_count), 0),
+            sql_func.coalesce(sql_func.sum(models.DailyStats.driving_minutes), 0),
+        )
+        .where(models.DailyStats.user_id == user_id, models.DailyStats.event_type == TRIP_EVENT)
     )
-    return dict(result.all())
+    if start_day is not None:
+        query = query.where(models.DailyStats.day >= start_day)
+    if end_day is not None:
+        query = query.where(models.DailyStats.day <= end_day)
+    result = await db.execute(query)
+    total_trips, total_minutes = result.one()
+    return int(total_trips), int(total_minutes)
 
-async def get_trip_detection_count(db: AsyncSession, trip_id: int):
+async def get_daily_detection_breakdown(db: AsyncSession, user_id: int, start_day: date = None, end_day: date = None):
+    # {event_type: count} from the rollup, for trips started within the day range
     from sqlalchemy import func as sql_func
-    result = await db.execute(
-        select(sql_func.count(models.DetectionLog.log_id))
-        .where(models.DetectionLog.trip_id == trip_id)
+    query = (
+        select(models.DailyStats.event_type, sql_func.sum(models.DailyStats.detection_count))
+        .where(models.DailyStats.user_id == user_id, models.DailyStats.event_type != TRIP_EVENT)
+        .group_by(models.DailyStats.event_type)
     )
-    return result.scalar() or 0
+    if start_day is not None:
+        query = query.where(models.DailyStats.day >= start_day)
+    if end_day is not None:
+        query = query.where(models.DailyStats.day <= end_day)
+    result = await db.execute(query)
+    return {event_type: int(count) for event_type, count in result.all() if count}
 
-async def get_trips_by_range(db: AsyncSession, user_id: int, start_date: datetime, end_date: datetime):
-    # Fetch trips within range
-    from sqlalchemy import and_
+async def get_daily_driving_minutes(db: AsyncSession, user_id: int, period_starts: dict, end_day: date):
+    # Minutes driven since each start day, e.g. {"today": ..., "week": ...}, as one conditional SUM per period
+    from sqlalchemy import func as sql_func, case
+    columns = [
+        sql_func.coalesce(sql_func.sum(case((models.DailyStats.day >= start, models.DailyStats.driving_minutes), else_=0)), 0).label(name)
+        for name, start in period_starts.items()
+    ]
     result = await db.execute(
-        select(models.Trip)
+        select(*columns)
         .where(
-            and_(
-                models.Trip.user_id == user_id,
-                models.Trip.start_time >= start_date,
-                models.Trip.start_time <= end_date
-            )
+            models.DailyStats.user_id == user_id,
+            models.DailyStats.event_type == TRIP_EVENT,
+            models.DailyStats.day >= min(period_starts.values()),
+            models.DailyStats.day <= end_day,
         )
-        .order_by(models.Trip.start_time.desc())
     )
-    return result.scalars().all()
+    return {name: int(value) for name, value in result.one()._mapping.items()}
 
-async def get_active_driving_days(db: AsyncSession, user_id: int, month: int, year: int):
-    # Returns raw list of start_times
-    from sqlalchemy import extract, and_
+async def get_daily_active_days(db: AsyncSession, user_id: int, start_day: date, end_day: date):
+    # Days with at least one trip, from the rollup
     result = await db.execute(
-        select(models.Trip.start_time)
+        select(models.DailyStats.day)
         .where(
-            and_(
-                models.Trip.user_id == user_id,
-                extract('month', models.Trip.start_time) == month,
-                extract('year', models.Trip.start_time) == year
-            )
+            models.DailyStats.user_id == user_id,
+            models.DailyStats.event_type == TRIP_EVENT,
+            models.DailyStats.trip_count > 0,
+            models.DailyStats.day >= start_day,
+            models.DailyStats.day <= end_day,
         )
+        .order_by(models.DailyStats.day)
     )
     return result.scalars().all()
-
@@ -0,0 +1,179 @@
+import ast
+import os
+from typing import List
+
+import numpy as np
+
+from inference.preprocess import INFERENCE_IMGSZ, Preprocessor, check_imgsz
+from inference.results import Detections, from_ultralytics
+
+# torch | onnx | openvino
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+MODEL_PATH = os.getenv("MODEL_PATH", "access/best.pt")
+# Produced by `python -m inference.export` (OpenVINO reads the same ONNX file)
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", "access/best.onnx")
+LABELS_PATH = "access/labels.txt"
+# Threads each model instance may use for one forward pass (0 = runtime default)
+INFERENCE_INTRA_OP_THREADS = int(os.getenv("INFERENCE_INTRA_OP_THREADS", 0))
+
+# Same defaults as ultralytics predict() so every backend returns the same detections
+CONF_THRESHOLD = float(os.getenv("INFERENCE_CONF", 0.25))
+IOU_THRESHOLD = float(os.getenv("INFERENCE_IOU", 0.7))
+MAX_DETECTIONS = 300
+
+
+def model_path(backend: str = INFERENCE_BACKEND) -> str:
+    return MODEL_PATH if backend == "torch" else ONNX_MODEL_PATH
+
+
+def load_backend(backend: str = INFERENCE_BACKEND, threads: int = INFERENCE_INTRA_OP_THREADS):
+    if backend == "torch":
+        return TorchBackend(MODEL_PATH, threads)
+    if backend == "onnx":
+        return OnnxBackend(ONNX_MODEL_PATH, threads)
+    if backend == "openvino":
+        return OpenVinoBackend(ONNX_MODEL_PATH, threads)
+    raise ValueError(f"Unknown inference backend: {backend}")
+
+
+def read_labels(path: str = LABELS_PATH) -> dict:
+    with open(path) as f:
+        return {i: line.strip() for i, line in enumerate(f) if line.strip()}
+
+
+class TorchBackend:
+    """The original PyTorch checkpoint, run through ultralytics."""
+
+    def __init__(self, path: str, threads: int = 0):
+        import torch
+        from ultralytics import YOLO
+
+        if threads:
+            # Process-wide in torch: only meaningful with one model per process
+            torch.set_num_threads(threads)
+        self.model = YOLO(path)
+        self.names = self.model.names
+        self.imgsz = check_imgsz(INFERENCE_IMGSZ)
+
+    def predict(self, images: list) -> List[Detections]:
+        # A list source is run through the model as a single batch
+        results = self.model(
+            images, imgsz=self.imgsz, verbose=False,
+            conf=CONF_THRESHOLD, iou=IOU_THRESHOLD, max_det=MAX_DETECTIONS,
+        )
+        return [from_ultralytics(r) for r in results]
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Greedy non-maximum suppression. Returns kept indices, highest score first."""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    # Stable descending sort so equal scores keep anchor order, like torch
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-7)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess(output: np.ndarray, ratio: float, pad, shape) -> Detections:
+    """
+    Decode one image of raw YOLOv8 output (4 + num_classes, num_anchors):
+    confidence filter, class-aware NMS, then scale boxes back to the original image.
+    """
+    pred = output.T
+    class_scores = pred[:, 4:]
+    class_ids = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(pred)), class_ids]
+    mask = scores > CONF_THRESHOLD
+    pred, scores, class_ids = pred[mask], scores[mask], class_ids[mask]
+
+    cx, cy, w, h = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+    # Offset boxes per class so NMS never suppresses across classes
+    offsets = class_ids[:, None].astype(np.float32) * 7680
+    keep = nms(boxes + offsets, scores, IOU_THRESHOLD)[:MAX_DETECTIONS]
+    boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep]
+
+    boxes[:, [0, 2]] -= pad[0]
+    boxes[:, [1, 3]] -= pad[1]
+    boxes /= ratio
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, shape[0])
+    return Detections(boxes.astype(np.float32), scores.astype(np.float32), class_ids.astype(np.int64))
+
+
+class ExportedBackend:
+    """
+    Base for runtimes that execute the exported ONNX graph without torch.
+    Preprocessing and NMS are done in NumPy; subclasses only run the graph.
+    """
+
+    dynamic_batch = True
+
+    def _init_preprocess(self, static_size):
+        # A model exported with a fixed input size can only run at that size;
+        # a dynamic one gets minimal rectangles like the torch path
+        self.imgsz = static_size or INFERENCE_IMGSZ
+        self.preprocess = Preprocessor(self.imgsz, auto=static_size is None)
+
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def predict(self, images: list) -> List[Detections]:
+        batch, ratios, pads = self.preprocess(images)
+        if self.dynamic_batch:
+            outputs = self._run(batch)
+        else:
+            outputs = np.concatenate([self._run(batch[i:i + 1]) for i in range(len(batch))])
+        return [
+            postprocess(outputs[i], ratios[i], pads[i], images[i].shape)
+            for i in range(len(images))
+        ]
+
+
+class OnnxBackend(ExportedBackend):
+    def __init__(self, path: str, threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+
+        # ultralytics stores class names and export size in the ONNX metadata
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else read_labels()
+        height = model_input.shape[2]
+        self._init_preprocess(height if isinstance(height, int) else None)
+
+    def _run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoBackend(ExportedBackend):
+    def __init__(self, path: str, threads: int = 0):
+        import openvino as ov
+
+        core = ov.Core()
+        model = core.read_model(path)
+        shape = model.input(0).get_partial_shape()
+        self.dynamic_batch = shape[0].is_dynamic
+        self._init_preprocess(shape[2].get_length() if shape[2].is_static else None)
+        config = {"INFERENCE_NUM_THREADS": threads} if threads else {}
+        self.compiled = core.compile_model(model, "CPU", config)
+        self.output = self.compiled.output(0)
+        self.names = read_labels()
+
+    def _run(self, batch):
+        return self.compiled(batch)[self.output]
@@ -0,0 +1,90 @@
+import asyncio
+import os
+
+from inference.executor import InferenceExecutor, InferenceQueueFull
+
+# Largest number of frames sent through the model in one forward pass
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", 8))
+# How long the first frame of a batch may wait for others to join (milliseconds)
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", 5))
+
+
+class BatchScheduler:
+    """
+    Collects frames from every connection and runs them through the executor as
+    batches of up to `max_batch` frames, waiting at most `max_wait_ms` after the
+    first frame arrives. Each caller gets back the result of its own frame.
+    """
+
+    def __init__(self, executor: InferenceExecutor, max_batch: int = INFERENCE_MAX_BATCH, max_wait_ms: float = INFERENCE_MAX_WAIT_MS):
+        self.executor = executor
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        # Enough room for every executor slot to be filled with a full batch
+        self._maxsize = self.max_batch * (executor.workers + executor.queue_size)
+        self._queue = None
+        self._task = None
+        self._inflight = set()
+
+    def _ensure_started(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self._maxsize)
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, data: bytes):
+        """Queue encoded image bytes for the next batch and wait for this frame's result."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((data, future))
+        except asyncio.QueueFull:
+            raise InferenceQueueFull(f"{self._queue.qsize()} frames waiting for a batch")
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                # Still take whatever is already queued without waiting
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Dispatch without awaiting so the next batch can form while this one runs
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch):
+        frames = [data for data, _ in batch]
+        try:
+            results = await self.executor.decode_and_detect_batch(frames)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            # The connection may have gone away while its frame was in the batch
+            if not future.done():
+                future.set_result(result)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._inflight):
+            task.cancel()
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from inference.backends import INFERENCE_BACKEND, load_backend
+from inference.results import Detections
+from inference.preprocess import decode_image
+
+# Number of inference threads (each one holds its own model instance)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 1))
+# How many frames may wait for a free worker before new ones are rejected
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", 8))
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the executor already has too many frames waiting."""
+
+
+def rescale(det: Detections, scale: float) -> Detections:
+    """Map boxes from a reduced-size decode back to the original frame."""
+    if scale == 1:
+        return det
+    return det._replace(boxes=det.boxes * scale)
+
+
+class InferenceExecutor:
+    """
+    Runs YOLO inference on a bounded thread pool so the async handlers can await it
+    instead of blocking the event loop.
+
+    Model instances are not thread-safe, so one backend is loaded per worker and
+    handed out from an idle pool for the duration of a call.
+    """
+
+    def __init__(self, backend: str = INFERENCE_BACKEND, workers: int = INFERENCE_WORKERS, queue_size: int = INFERENCE_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+
+        self._models = queue.SimpleQueue()
+        for _ in range(self.workers):
+            self._models.put(load_backend(backend))
+        first = self._models.get()
+        self.names = first.names
+        self.imgsz = first.imgsz
+        self._models.put(first)
+
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Frames currently running or waiting for a worker."""
+        return self._pending
+
+    @property
+    def load(self) -> float:
+        """Share of the executor's capacity in use, from 0 (idle) to 1 (rejecting frames)."""
+        return min(1.0, self._pending / (self.workers + self.queue_size))
+
+    def _infer(self, images: list):
+        model = self._models.get()
+        try:
+            return model.predict(images)
+        finally:
+            self._models.put(model)
+
+    def _decode_and_infer(self, data: bytes):
+        img, scale = decode_image(data, self.imgsz)
+        if img is None:
+            return None
+        return rescale(self._infer([img])[0], scale)
+
+    def _decode_and_infer_batch(self, frames):
+        decoded = [decode_image(data, self.imgsz) for data in frames]
+        valid = [img for img, _ in decoded if img is not None]
+        if not valid:
+            return [None] * len(frames)
+        batch_results = iter(self._infer(valid))
+        return [rescale(next(batch_results), scale) if img is not None else None for img, scale in decoded]
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                raise InferenceQueueFull(f"{self._pending} frames already pending")
+            self._pending += 1
+        future = self._pool.submit(fn, *args)
+        # Release the slot when the worker finishes, even if the caller stopped waiting
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def detect(self, img):
+        """Run inference on an already decoded BGR image."""
+        results = await self._submit(self._infer, [img])
+        return results[0]
+
+    async def decode_and_detect(self, data: bytes):
+        """Decode encoded image bytes and run inference. Returns None if the bytes are not an image."""
+        return await self._submit(self._decode_and_infer, data)
+
+    async def decode_and_detect_batch(self, frames):
+        """
+        Decode a list of encoded frames and run them as one batch.
+        Returns one Detections per frame, or None for frames that are not images.
+        """
+        return await self._submit(self._decode_and_infer_batch, frames)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
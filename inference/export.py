@@ -0,0 +1,95 @@
+"""
+Export access/best.pt to ONNX for the CPU backends and check it against the torch model.
+
+    python -m inference.export                      # access/best.onnx
+    python -m inference.export --int8               # also access/best.int8.onnx
+    python -m inference.export --check img1.jpg ... # compare torch vs ONNX detections
+"""
+import argparse
+import os
+import shutil
+import sys
+
+import cv2
+import numpy as np
+
+from inference.backends import MODEL_PATH, ONNX_MODEL_PATH, TorchBackend, OnnxBackend, OpenVinoBackend
+from inference.preprocess import INFERENCE_IMGSZ
+
+
+def export_onnx(pt_path: str = MODEL_PATH, onnx_path: str = ONNX_MODEL_PATH, imgsz: int = INFERENCE_IMGSZ) -> str:
+    from ultralytics import YOLO
+
+    # dynamic=True keeps the batch axis open so the batch scheduler can use it
+    exported = YOLO(pt_path).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    if os.path.abspath(exported) != os.path.abspath(onnx_path):
+        shutil.move(exported, onnx_path)
+    return onnx_path
+
+
+def quantize_int8(onnx_path: str) -> str:
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    int8_path = onnx_path.replace(".onnx", ".int8.onnx")
+    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+    return int8_path
+
+
+def compare(reference, candidate, box_tol: float, score_tol: float) -> str:
+    """Returns a description of the first mismatch, or an empty string when both agree."""
+    if len(reference.scores) != len(candidate.scores):
+        return f"{len(reference.scores)} vs {len(candidate.scores)} detections"
+    ref_order = np.lexsort((-reference.scores, reference.class_ids))
+    cand_order = np.lexsort((-candidate.scores, candidate.class_ids))
+    if not np.array_equal(reference.class_ids[ref_order], candidate.class_ids[cand_order]):
+        return "class ids differ"
+    box_diff = np.abs(reference.boxes[ref_order] - candidate.boxes[cand_order]).max(initial=0)
+    if box_diff > box_tol:
+        return f"boxes differ by {box_diff:.1f}px"
+    score_diff = np.abs(reference.scores[ref_order] - candidate.scores[cand_order]).max(initial=0)
+    if score_diff > score_tol:
+        return f"scores differ by {score_diff:.3f}"
+    return ""
+
+
+def check_parity(images, onnx_path: str, runtime: str = "onnx", box_tol: float = 2.0, score_tol: float = 0.02) -> bool:
+    torch_backend = TorchBackend(MODEL_PATH)
+    exported_backend = OnnxBackend(onnx_path) if runtime == "onnx" else OpenVinoBackend(onnx_path)
+
+    ok = True
+    for path in images:
+        img = cv2.imread(path)
+        if img is None:
+            print(f"SKIP {path}: not an image")
+            continue
+        reference = torch_backend.predict([img])[0]
+        candidate = exported_backend.predict([img])[0]
+        problem = compare(reference, candidate, box_tol, score_tol)
+        print(f"{'FAIL' if problem else 'OK  '} {path}: {problem or f'{len(reference.scores)} detections match'}")
+        ok = ok and not problem
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imgsz", type=int, default=INFERENCE_IMGSZ)
+    parser.add_argument("--int8", action="store_true", help="also write a dynamically quantized INT8 model")
+    parser.add_argument("--check", nargs="*", metavar="IMAGE", help="only compare torch and ONNX outputs on these images")
+    parser.add_argument("--onnx", default=ONNX_MODEL_PATH, help="ONNX model to export to / check")
+    parser.add_argument("--runtime", choices=["onnx", "openvino"], default="onnx", help="runtime used for --check")
+    parser.add_argument("--box-tol", type=float, default=2.0, help="max box difference in pixels")
+    parser.add_argument("--score-tol", type=float, default=0.02, help="max confidence difference")
+    args = parser.parse_args()
+
+    if args.check is not None:
+        ok = check_parity(args.check, args.onnx, args.runtime, args.box_tol, args.score_tol)
+        sys.exit(0 if ok else 1)
+
+    path = export_onnx(MODEL_PATH, args.onnx, args.imgsz)
+    print(f"Exported {path}")
+    if args.int8:
+        print(f"Quantized {quantize_int8(path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import os
+import struct
+
+import cv2
+import numpy as np
+
+# Model input size (square, multiple of 32). Smaller is faster, larger finds smaller objects.
+INFERENCE_IMGSZ = int(os.getenv("INFERENCE_IMGSZ", 640))
+STRIDE = 32
+PAD_VALUE = 114
+
+# JPEG decoding can downscale by these factors for a fraction of the cost of a full decode
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def check_imgsz(imgsz: int) -> int:
+    if imgsz <= 0 or imgsz % STRIDE:
+        raise ValueError(f"Inference size must be a positive multiple of {STRIDE}, got {imgsz}")
+    return imgsz
+
+
+def image_size(data: bytes):
+    """Read (width, height) from a JPEG or PNG header without decoding. None if unknown."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        # SOF0..SOF15 hold the frame size; C4, C8 and CC are other segments
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    return None
+
+
+def decode_image(data: bytes, imgsz: int = INFERENCE_IMGSZ):
+    """
+    Decode encoded image bytes, as small as possible without going below the model input size.
+    Large JPEGs are decoded at 1/2, 1/4 or 1/8 scale directly by libjpeg.
+    Returns (image, scale) where scale maps decoded pixels back to the original frame,
+    or (None, 1) if the bytes are not an image.
+    """
+    nparr = np.frombuffer(data, np.uint8)
+    size = image_size(data) if data[:2] == b"\xff\xd8" else None
+    if size is not None:
+        longest = max(size)
+        for factor, flag in _REDUCED_FLAGS:
+            if longest // factor >= imgsz:
+                img = cv2.imdecode(nparr, flag)
+                if img is not None:
+                    return img, float(factor)
+                break
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR), 1.0
+
+
+def letterbox_params(shape, imgsz: int, auto: bool = False):
+    """
+    Scale ratio, resized (w, h), (left, top) padding and padded (w, h), matching ultralytics LetterBox.
+    With auto, the image is only padded up to the next stride multiple instead of a full square.
+    """
+    h, w = shape[:2]
+    ratio = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    dw, dh = imgsz - new_w, imgsz - new_h
+    if auto:
+        dw, dh = dw % STRIDE, dh % STRIDE
+    dw, dh = dw / 2, dh / 2
+    left, top = int(round(dw - 0.1)), int(round(dh - 0.1))
+    out_w = new_w + left + int(round(dw + 0.1))
+    out_h = new_h + top + int(round(dh + 0.1))
+    return ratio, (new_w, new_h), (left, top), (out_w, out_h)
+
+
+class Preprocessor:
+    """
+    Letterboxes frames into preallocated buffers and converts them to an RGB NCHW
+    float32 batch, so steady-state preprocessing allocates nothing.
+    Buffers are reused between calls: keep one instance per worker.
+
+    With auto (models with dynamic height/width), a batch whose frames all have the
+    same shape is padded to the smallest stride-aligned rectangle, like ultralytics
+    does for .pt models. Mixed shapes fall back to imgsz x imgsz.
+    """
+
+    def __init__(self, imgsz: int = INFERENCE_IMGSZ, auto: bool = False):
+        self.imgsz = check_imgsz(imgsz)
+        self.auto = auto
+        self._canvas = np.full((imgsz, imgsz, 3), PAD_VALUE, np.uint8)
+        self._flat = np.empty(0, np.float32)
+
+    def _letterbox_into_canvas(self, img, auto: bool):
+        ratio, (new_w, new_h), (left, top), (out_w, out_h) = letterbox_params(img.shape, self.imgsz, auto)
+        canvas = self._canvas[:out_h, :out_w]
+        # Repaint the padding; the previous frame may have used a different geometry
+        canvas[:top] = PAD_VALUE
+        canvas[top + new_h:] = PAD_VALUE
+        canvas[top:top + new_h, :left] = PAD_VALUE
+        canvas[top:top + new_h, left + new_w:] = PAD_VALUE
+        region = canvas[top:top + new_h, left:left + new_w]
+        if img.shape[1] != new_w or img.shape[0] != new_h:
+            cv2.resize(img, (new_w, new_h), dst=region, interpolation=cv2.INTER_LINEAR)
+        else:
+            region[...] = img
+        return canvas, ratio, (left, top)
+
+    def __call__(self, images: list):
+        """Returns (batch, ratios, pads). The batch is a view into the reused buffer."""
+        auto = self.auto and all(img.shape == images[0].shape for img in images)
+        _, _, _, (out_w, out_h) = letterbox_params(images[0].shape, self.imgsz, auto)
+        size = len(images) * 3 * out_h * out_w
+        if size > len(self._flat):
+            self._flat = np.empty(size, np.float32)
+        batch = self._flat[:size].reshape(len(images), 3, out_h, out_w)
+        ratios, pads = [], []
+        for i, img in enumerate(images):
+            canvas, ratio, pad = self._letterbox_into_canvas(img, auto)
+            # BGR HWC -> RGB CHW, scaled to [0, 1], written straight into the batch buffer
+            np.multiply(canvas[..., ::-1].transpose(2, 0, 1), 1 / 255.0, out=batch[i], casting="unsafe")
+            ratios.append(ratio)
+            pads.append(pad)
+        return batch, ratios, pads
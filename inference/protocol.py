@@ -0,0 +1,104 @@
+"""
+Compact response formats for /ai/ws/detect, negotiated through the WebSocket subprotocol.
+
+Clients that offer no known subprotocol keep getting JSON. Binary clients receive one
+JSON text message after the handshake, {"protocol", "names"} with the class id -> label
+map (plus "logging" with log=true), then one binary message per frame. Errors are still
+sent as JSON text messages.
+
+drowsiness.struct.v1 (little-endian):
+    header, 12 bytes:
+        u8  version (1)
+        u8  status class id
+        u8  raw_status class id
+        u8  perclos, percent
+        u16 recommended interval_ms
+        u16 recommended resolution
+        u16 dropped_frames (0 unless mode=latest, saturates at 65535)
+        u16 number of detections N
+    N records, 10 bytes each:
+        u8  class id
+        u8  confidence, percent
+        u16 x1, y1, x2, y2
+
+drowsiness.msgpack.v1:
+    {"v": 1, "s": status id, "r": raw_status id, "p": perclos percent,
+     "i": interval_ms, "z": resolution, "d": dropped_frames,
+     "c": [class ids], "f": [confidence percents], "b": [x1, y1, x2, y2, x1, ...]}
+"""
+import struct
+
+import numpy as np
+
+from inference.results import Detections
+
+JSON = "json"
+STRUCT_SUBPROTOCOL = "drowsiness.struct.v1"
+MSGPACK_SUBPROTOCOL = "drowsiness.msgpack.v1"
+VERSION = 1
+
+HEADER = struct.Struct("<BBBBHHHH")
+DETECTION = np.dtype([("class_id", "u1"), ("confidence", "u1"), ("box", "<u2", (4,))])
+
+
+def supported_subprotocols() -> list:
+    subprotocols = [STRUCT_SUBPROTOCOL]
+    try:
+        import msgpack  # noqa: F401
+        subprotocols.append(MSGPACK_SUBPROTOCOL)
+    except ImportError:
+        pass
+    return subprotocols
+
+
+def negotiate(offered: list) -> str:
+    """Pick the first subprotocol offered by the client that we support, else JSON."""
+    supported = supported_subprotocols()
+    for subprotocol in offered:
+        if subprotocol in supported:
+            return subprotocol
+    return JSON
+
+
+def _percent(values) -> np.ndarray:
+    return np.clip(np.rint(np.asarray(values) * 100), 0, 100).astype(np.uint8)
+
+
+def _boxes(det: Detections) -> np.ndarray:
+    # Same truncation as int() in the JSON response, bounded to u16
+    return np.clip(det.boxes, 0, 65535).astype(np.uint16)
+
+
+def encode_struct(det: Detections, status_id: int, raw_status_id: int, perclos: float, recommended: dict, dropped: int) -> bytes:
+    records = np.empty(len(det.class_ids), DETECTION)
+    records["class_id"] = det.class_ids
+    records["confidence"] = _percent(det.scores)
+    records["box"] = _boxes(det)
+    header = HEADER.pack(
+        VERSION, status_id, raw_status_id, int(_percent(perclos)),
+        recommended["interval_ms"], recommended["resolution"], min(dropped, 65535), len(records),
+    )
+    return header + records.tobytes()
+
+
+def encode_msgpack(det: Detections, status_id: int, raw_status_id: int, perclos: float, recommended: dict, dropped: int) -> bytes:
+    import msgpack
+
+    return msgpack.packb({
+        "v": VERSION,
+        "s": status_id,
+        "r": raw_status_id,
+        "p": int(_percent(perclos)),
+        "i": recommended["interval_ms"],
+        "z": recommended["resolution"],
+        "d": dropped,
+        "c": det.class_ids.tolist(),
+        "f": _percent(det.scores).tolist(),
+        "b": _boxes(det).ravel().tolist(),
+    })
+
+
+ENCODERS = {
+    STRUCT_SUBPROTOCOL: encode_struct,
+    MSGPACK_SUBPROTOCOL: encode_msgpack,
+}
@@ -0,0 +1,39 @@
+import os
+
+from inference.preprocess import STRIDE
+from inference.results import CRITICAL_LABELS, WARNING_LABELS, status_level
+from inference.temporal import TemporalFilter
+
+# Frame interval recommended to clients, per situation (milliseconds)
+FRAME_INTERVAL_CRITICAL_MS = int(os.getenv("FRAME_INTERVAL_CRITICAL_MS", 100))
+FRAME_INTERVAL_WARNING_MS = int(os.getenv("FRAME_INTERVAL_WARNING_MS", 200))
+FRAME_INTERVAL_IDLE_MS = int(os.getenv("FRAME_INTERVAL_IDLE_MS", 500))
+# Upper bound when the server is saturated and the driver is awake
+FRAME_INTERVAL_MAX_MS = int(os.getenv("FRAME_INTERVAL_MAX_MS", 1000))
+# Executor load above which awake drivers are also asked for smaller frames
+HIGH_LOAD = float(os.getenv("FRAME_HIGH_LOAD", 0.75))
+
+
+def recommend(temporal: TemporalFilter, load: float, imgsz: int) -> dict:
+    """
+    Next-frame interval and frame size (longest side, pixels) for a client.
+
+    Drivers with a critical status or critical detections in the recent window
+    get the fastest rate whatever the load. Everyone else is slowed down
+    proportionally to the executor load, so a busy node sheds work from the
+    drivers who need it least.
+    """
+    if status_level(temporal.status) == 2 or temporal.seen(CRITICAL_LABELS):
+        return {"interval_ms": FRAME_INTERVAL_CRITICAL_MS, "resolution": imgsz}
+
+    if status_level(temporal.status) == 1 or temporal.seen(WARNING_LABELS):
+        base = FRAME_INTERVAL_WARNING_MS
+    else:
+        base = FRAME_INTERVAL_IDLE_MS
+
+    interval = min(FRAME_INTERVAL_MAX_MS, int(base * (1 + load)))
+    resolution = imgsz
+    if load >= HIGH_LOAD and base == FRAME_INTERVAL_IDLE_MS:
+        # Smaller uploads decode faster; the model still runs at imgsz
+        resolution = max(STRIDE, int(imgsz * 0.75) // STRIDE * STRIDE)
+    return {"interval_ms": interval, "resolution": resolution}
@@ -0,0 +1,79 @@
+"""
+Shared result extraction for /ai/detect and /ai/ws/detect.
+
+Everything works on whole-frame NumPy arrays instead of per-box tensor ops.
+tests/test_results.py checks it against the old per-box loop; run it directly for a micro-benchmark.
+"""
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+# Priority: Drowsy > Head Drop > Yawn > Phone > Distracted > Awake
+CRITICAL_LABELS = ("drowsy", "head drop")
+WARNING_LABELS = ("yawn", "phone", "distracted")
+
+
+class Detections(NamedTuple):
+    """Detections of one image, in original image pixel coordinates."""
+    boxes: np.ndarray      # (N, 4) float32, x1 y1 x2 y2
+    scores: np.ndarray     # (N,) float32
+    class_ids: np.ndarray  # (N,) int64
+
+
+def status_level(status: str) -> int:
+    if status in CRITICAL_LABELS:
+        return 2
+    if status in WARNING_LABELS:
+        return 1
+    return 0
+
+
+def from_ultralytics(result) -> Detections:
+    """Convert one ultralytics Results with a single device->host copy of its (N, 6) box tensor."""
+    data = result.boxes.data.cpu().numpy()
+    return Detections(
+        boxes=data[:, :4],
+        scores=data[:, -2],  # tracked results carry an id column before conf/cls
+        class_ids=data[:, -1].astype(np.int64),
+    )
+
+
+def filter_detections(det: Detections, min_confidence: float = 0.0, class_ids: Optional[List[int]] = None) -> Detections:
+    """Keep detections at or above min_confidence and, if given, only these classes."""
+    if min_confidence <= 0 and class_ids is None:
+        return det
+    mask = det.scores >= min_confidence
+    if class_ids is not None:
+        mask &= np.isin(det.class_ids, class_ids)
+    return Detections(det.boxes[mask], det.scores[mask], det.class_ids[mask])
+
+
+def status_levels(names: dict) -> np.ndarray:
+    """Lookup table class id -> priority level (2 critical, 1 warning, 0 none)."""
+    levels = np.zeros(max(names) + 1, np.int8)
+    for i, label in names.items():
+        levels[i] = status_level(label)
+    return levels
+
+
+def frame_status(det: Detections, names: dict, levels: np.ndarray) -> str:
+    """
+    Status of a single frame: the highest-confidence critical detection, else the
+    highest-confidence warning, else "awake".
+    """
+    if not len(det.class_ids):
+        return "awake"
+    frame_levels = levels[det.class_ids]
+    # Detections are ordered by confidence, argmax returns the first of the top level
+    best = int(frame_levels.argmax())
+    return names[int(det.class_ids[best])] if frame_levels[best] else "awake"
+
+
+def to_json(det: Detections, names: dict) -> list:
+    """Detections as the JSON list returned by the endpoints."""
+    boxes = det.boxes.astype(np.int64).tolist()  # [x1, y1, x2, y2], truncated like int()
+    return [
+        {"label": names[cls_id], "confidence": round(conf, 2), "box": box}
+        for cls_id, conf, box in zip(det.class_ids.tolist(), det.scores.tolist(), boxes)
+    ]
+
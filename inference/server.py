@@ -0,0 +1,63 @@
+"""
+Standalone inference node: loads the model, warms it up and serves it to API
+processes started with INFERENCE_TRANSPORT pointing here.
+
+    python -m inference.server --listen tcp://0.0.0.0:9100
+    python -m inference.server --listen unix:///run/inference.sock
+
+Model settings (INFERENCE_BACKEND, INFERENCE_WORKERS, INFERENCE_PROCESSES, ...) apply
+here, not in the API. Start as many nodes as the frame rate needs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import time
+
+from inference.backends import INFERENCE_BACKEND
+from inference.executor import InferenceExecutor
+from inference.transport import INFERENCE_LISTEN, InferenceServer
+from inference.warmup import INFERENCE_WARMUP_RUNS, warm_up
+from inference.workers import INFERENCE_PROCESSES, ProcessInferencePool
+
+
+async def serve(listen: str, backend: str = INFERENCE_BACKEND, processes: int = INFERENCE_PROCESSES):
+    if processes > 0:
+        executor = await asyncio.to_thread(ProcessInferencePool, backend, processes)
+    else:
+        executor = await asyncio.to_thread(InferenceExecutor, backend)
+    try:
+        if INFERENCE_WARMUP_RUNS > 0:
+            start = time.perf_counter()
+            timings = await warm_up(executor)
+            print(f"Model warm-up done in {time.perf_counter() - start:.1f}s: {json.dumps(timings)}")
+
+        if listen.startswith("unix://") and os.path.exists(listen[len("unix://"):]):
+            # Left behind by a previous node that did not exit cleanly
+            os.unlink(listen[len("unix://"):])
+        server = await InferenceServer(executor).listen(listen)
+        print(f"Inference node ({backend}, {executor.workers} workers) listening on {listen}")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        async with server:
+            await stop.wait()
+    finally:
+        executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listen", default=INFERENCE_LISTEN, help="unix:///path or tcp://host:port")
+    parser.add_argument("--backend", default=INFERENCE_BACKEND, choices=["torch", "onnx", "openvino"])
+    parser.add_argument("--processes", type=int, default=INFERENCE_PROCESSES,
+                        help="inference processes (0 = threads, see INFERENCE_WORKERS)")
+    args = parser.parse_args()
+    asyncio.run(serve(args.listen, args.backend, args.processes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+import time
+
+import numpy as np
+
+from inference.results import WARNING_LABELS, Detections, status_level
+
+# Length of the sliding window used for voting and PERCLOS (seconds)
+TEMPORAL_WINDOW_S = float(os.getenv("TEMPORAL_WINDOW_S", 2.0))
+# Ring buffer capacity per connection (frames); bounds memory whatever the frame rate
+TEMPORAL_BUFFER = int(os.getenv("TEMPORAL_BUFFER", 64))
+# Smoothing factor of the per-class confidence EMA (1 = no smoothing)
+TEMPORAL_EMA_ALPHA = float(os.getenv("TEMPORAL_EMA_ALPHA", 0.5))
+# Share of window frames with "drowsy" needed to call the driver drowsy (PERCLOS)
+PERCLOS_THRESHOLD = float(os.getenv("PERCLOS_THRESHOLD", 0.3))
+# Share of window frames a class must appear in for the other statuses
+VOTE_THRESHOLD = float(os.getenv("TEMPORAL_VOTE_THRESHOLD", 0.5))
+# How long a new status must persist before it is reported (seconds)
+CRITICAL_HOLD_S = float(os.getenv("CRITICAL_HOLD_S", 0.3))
+WARNING_HOLD_S = float(os.getenv("WARNING_HOLD_S", 1.0))
+RECOVER_HOLD_S = float(os.getenv("RECOVER_HOLD_S", 1.0))
+
+
+class TemporalFilter:
+    """
+    Turns per-frame detections into a stable driver status for one connection.
+
+    Per-class confidences are kept in a fixed-size ring buffer. A status becomes a
+    candidate when its class is present in enough of the recent window (PERCLOS for
+    "drowsy"), and is only reported once the candidate has persisted for the hold
+    time of its level. Windows and holds are in seconds, so the result does not
+    depend on how often the client sends frames.
+    """
+
+    def __init__(self, names: dict):
+        self.num_classes = max(names) + 1
+        self._index = {label: i for i, label in names.items()}
+
+        self._scores = np.zeros((TEMPORAL_BUFFER, self.num_classes), np.float32)
+        self._times = np.full(TEMPORAL_BUFFER, -np.inf)
+        self._next = 0
+        self.ema = np.zeros(self.num_classes, np.float32)
+
+        self.status = "awake"
+        self._candidate = "awake"
+        self._candidate_since = 0.0
+        self.votes = np.zeros(self.num_classes, np.float32)
+        self.perclos = 0.0
+
+    def _class_scores(self, det: Detections) -> np.ndarray:
+        scores = np.zeros(self.num_classes, np.float32)
+        # Highest confidence of each class in this frame
+        np.maximum.at(scores, det.class_ids, det.scores)
+        return scores
+
+    def _vote(self, votes: np.ndarray, label: str) -> float:
+        i = self._index.get(label)
+        return float(votes[i]) if i is not None else 0.0
+
+    def _candidate_status(self, votes: np.ndarray) -> str:
+        if self.perclos >= PERCLOS_THRESHOLD:
+            return "drowsy"
+        for label in ("head drop",) + WARNING_LABELS:
+            if self._vote(votes, label) >= VOTE_THRESHOLD:
+                return label
+        return "awake"
+
+    def _hold_time(self, candidate: str) -> float:
+        if status_level(candidate) < status_level(self.status):
+            return RECOVER_HOLD_S
+        return CRITICAL_HOLD_S if status_level(candidate) == 2 else WARNING_HOLD_S
+
+    def update(self, det: Detections, now: float = None) -> str:
+        """Add one frame's detections and return the filtered status."""
+        now = time.monotonic() if now is None else now
+        scores = self._class_scores(det)
+
+        self._scores[self._next] = scores
+        self._times[self._next] = now
+        self._next = (self._next + 1) % TEMPORAL_BUFFER
+        self.ema += TEMPORAL_EMA_ALPHA * (scores - self.ema)
+
+        # Share of frames in the window where each class was detected
+        in_window = self._times >= now - TEMPORAL_WINDOW_S
+        self.votes = votes = (self._scores[in_window] > 0).mean(axis=0)
+        self.perclos = self._vote(votes, "drowsy")
+
+        candidate = self._candidate_status(votes)
+        if candidate != self._candidate:
+            self._candidate = candidate
+            self._candidate_since = now
+        if candidate != self.status and now - self._candidate_since >= self._hold_time(candidate):
+            self.status = candidate
+        return self.status
+
+    def seen(self, labels) -> bool:
+        """Whether any of these classes was detected in the current window."""
+        return any(self._vote(self.votes, label) > 0 for label in labels)
+
+    def confidence(self, label: str) -> float:
+        """Smoothed confidence of a class."""
+        i = self._index.get(label)
+        return float(self.ema[i]) if i is not None else 0.0
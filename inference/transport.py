@@ -0,0 +1,406 @@
+"""
+Remote inference: the API forwards frames to standalone inference nodes
+(`python -m inference.server`) instead of holding a model itself, so API replicas
+stay small and inference scales on its own.
+
+RemoteInferenceClient has the same interface as InferenceExecutor, so the batch
+scheduler and the /ai endpoints use it unchanged. Frames are batched in the API
+process and sent as one request per batch; each node decodes and runs them on its
+own executor. Connections:
+
+    unix:///run/inference.sock    Unix socket (nodes on the same host)
+    tcp://host:9100               TCP
+    local                         in-process queues, for tests and development
+
+Several nodes can be listed comma-separated; each batch goes to the least busy one.
+Messages are MessagePack maps behind a 4-byte big-endian length:
+
+    node -> API on connect: {"op": "hello", "names", "imgsz", "workers", "queue_size"}
+    API -> node:            {"id", "frames": [bytes, ...]}
+    node -> API:            {"id", "detections": [[boxes, scores, class_ids] | None, ...], "load"}
+                            {"id", "error", "busy", "load"}
+"""
+import asyncio
+import itertools
+import os
+import struct
+
+import cv2
+import numpy as np
+
+from inference.executor import InferenceQueueFull
+from inference.results import Detections
+
+# Where /ai/* inference runs: empty = in the API process, else the node URLs (see above)
+INFERENCE_TRANSPORT = os.getenv("INFERENCE_TRANSPORT", "")
+# Address a standalone inference node listens on
+INFERENCE_LISTEN = os.getenv("INFERENCE_LISTEN", "tcp://0.0.0.0:9100")
+# A request without a reply after this long fails and its frames get "Server busy"
+INFERENCE_REMOTE_TIMEOUT_S = float(os.getenv("INFERENCE_REMOTE_TIMEOUT_S", 10))
+# Longest wait between reconnection attempts to a node that went away
+INFERENCE_RECONNECT_MAX_S = float(os.getenv("INFERENCE_RECONNECT_MAX_S", 10))
+
+_HEADER = struct.Struct("!I")
+# Larger messages are a protocol error (a full batch of camera frames is a few MB)
+MAX_MESSAGE_BYTES = 64 << 20
+
+
+class InferenceUnavailable(InferenceQueueFull):
+    """No node could take the frames (none connected, or one went away mid-request)."""
+
+
+def pack_message(message: dict) -> bytes:
+    import msgpack
+
+    return msgpack.packb(message, use_bin_type=True)
+
+
+def unpack_message(data: bytes) -> dict:
+    import msgpack
+
+    # Class names are keyed by int
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def pack_detections(det):
+    if det is None:
+        return None
+    return [
+        det.boxes.astype(np.float32).tobytes(),
+        det.scores.astype(np.float32).tobytes(),
+        det.class_ids.astype(np.int64).tobytes(),
+    ]
+
+
+def unpack_detections(packed):
+    if packed is None:
+        return None
+    boxes, scores, class_ids = packed
+    return Detections(
+        boxes=np.frombuffer(boxes, np.float32).reshape(-1, 4),
+        scores=np.frombuffer(scores, np.float32),
+        class_ids=np.frombuffer(class_ids, np.int64),
+    )
+
+
+class StreamChannel:
+    """Length-prefixed messages over a Unix or TCP stream."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self._write_lock = asyncio.Lock()
+
+    async def send(self, message: dict):
+        data = pack_message(message)
+        async with self._write_lock:
+            self.writer.write(_HEADER.pack(len(data)) + data)
+            await self.writer.drain()
+
+    async def recv(self) -> dict:
+        (size,) = _HEADER.unpack(await self.reader.readexactly(_HEADER.size))
+        if size > MAX_MESSAGE_BYTES:
+            raise ConnectionError(f"Message of {size} bytes exceeds the limit")
+        return unpack_message(await self.reader.readexactly(size))
+
+    def close(self):
+        self.writer.close()
+
+
+class QueueChannel:
+    """One end of an in-process connection. Messages are still packed, so the wire format is exercised."""
+
+    def __init__(self, inbox: asyncio.Queue, outbox: asyncio.Queue):
+        self.inbox = inbox
+        self.outbox = outbox
+
+    @classmethod
+    def pair(cls):
+        a, b = asyncio.Queue(), asyncio.Queue()
+        return cls(a, b), cls(b, a)
+
+    async def send(self, message: dict):
+        self.outbox.put_nowait(pack_message(message))
+
+    async def recv(self) -> dict:
+        data = await self.inbox.get()
+        if data is None:
+            raise ConnectionError("Channel closed")
+        return unpack_message(data)
+
+    def close(self):
+        # Wake both ends
+        self.inbox.put_nowait(None)
+        self.outbox.put_nowait(None)
+
+
+class InferenceServer:
+    """Serves an executor to API processes: one task per request, replies in completion order."""
+
+    def __init__(self, executor):
+        self.executor = executor
+
+    def hello(self) -> dict:
+        return {
+            "op": "hello",
+            "names": self.executor.names,
+            "imgsz": self.executor.imgsz,
+            "workers": self.executor.workers,
+            "queue_size": self.executor.queue_size,
+        }
+
+    async def _handle(self, channel, request: dict):
+        reply = {"id": request["id"]}
+        try:
+            detections = await self.executor.decode_and_detect_batch(request["frames"])
+            reply["detections"] = [pack_detections(det) for det in detections]
+        except InferenceQueueFull as e:
+            reply.update(error=str(e), busy=True)
+        except Exception as e:
+            reply.update(error=f"{type(e).__name__}: {e}", busy=False)
+        reply["load"] = self.executor.load
+        try:
+            await channel.send(reply)
+        except (ConnectionError, RuntimeError):
+            pass  # The API went away; its side already failed the request
+
+    async def serve_channel(self, channel):
+        """Answer requests on one connection until it closes."""
+        tasks = set()
+        try:
+            await channel.send(self.hello())
+            while True:
+                request = await channel.recv()
+                task = asyncio.create_task(self._handle(channel, request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            channel.close()
+
+    async def listen(self, url: str):
+        """Start accepting API connections on a unix:// or tcp:// URL. Returns the asyncio server."""
+        async def on_connect(reader, writer):
+            try:
+                await self.serve_channel(StreamChannel(reader, writer))
+            except asyncio.CancelledError:
+                pass  # The node is shutting down
+
+        scheme, _, address = url.partition("://")
+        if scheme == "unix":
+            return await asyncio.start_unix_server(on_connect, path=address)
+        if scheme == "tcp":
+            host, _, port = address.rpartition(":")
+            return await asyncio.start_server(on_connect, host or None, int(port))
+        raise ValueError(f"Unsupported inference listen address: {url}")
+
+
+async def open_channel(url: str):
+    scheme, _, address = url.partition("://")
+    if scheme == "unix":
+        return StreamChannel(*await asyncio.open_unix_connection(address))
+    if scheme == "tcp":
+        host, _, port = address.rpartition(":")
+        return StreamChannel(*await asyncio.open_connection(host, int(port)))
+    raise ValueError(f"Unsupported inference transport: {url}")
+
+
+class _Node:
+    """Connection to one inference node, reconnected in the background when it drops."""
+
+    def __init__(self, url: str, local_server: InferenceServer = None):
+        if url == "local" and local_server is None:
+            raise ValueError("The local inference transport needs a server in this process")
+        if url != "local" and url.partition("://")[0] not in ("unix", "tcp"):
+            raise ValueError(f"Unsupported inference transport: {url}")
+        self.url = url
+        self.local_server = local_server
+        self.channel = None
+        self.info = None
+        self.load = 0.0
+        self.connected = asyncio.Event()
+        self._futures = {}
+        self._ids = itertools.count()
+        self._task = None
+        self._server_task = None
+
+    @property
+    def inflight(self) -> int:
+        return len(self._futures)
+
+    @property
+    def capacity(self) -> int:
+        return self.info["workers"] + self.info["queue_size"] if self.info else 0
+
+    async def _open(self):
+        if self.url != "local":
+            return await open_channel(self.url)
+        ours, theirs = QueueChannel.pair()
+        self._server_task = asyncio.create_task(self.local_server.serve_channel(theirs))
+        return ours
+
+    def _fail_pending(self, error: Exception):
+        futures, self._futures = self._futures, {}
+        for future in futures.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def _run(self):
+        delay = 0.1
+        while True:
+            try:
+                self.channel = await self._open()
+                hello = await self.channel.recv()
+                self.info, self.load = hello, 0.0
+                self.connected.set()
+                delay = 0.1
+                print(f"Connected to inference node {self.url} ({hello['workers']} workers)")
+                while True:
+                    reply = await self.channel.recv()
+                    self.load = reply.get("load", self.load)
+                    future = self._futures.pop(reply["id"], None)
+                    if future is not None and not future.done():
+                        future.set_result(reply)
+            except (OSError, asyncio.IncompleteReadError, ValueError, KeyError) as e:
+                if self.connected.is_set():
+                    print(f"WARNING: Lost inference node {self.url}: {e!r}")
+            except Exception as e:
+                # A malformed reply (or a bug here) must not end the reconnect loop for good
+                print(f"WARNING: Dropping connection to inference node {self.url} after an unexpected error: {e!r}")
+            finally:
+                self.connected.clear()
+                if self.channel is not None:
+                    self.channel.close()
+                    self.channel = None
+                self._fail_pending(InferenceUnavailable(f"Inference node {self.url} went away"))
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, INFERENCE_RECONNECT_MAX_S)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        for task in (self._task, self._server_task):
+            if task is not None:
+                task.cancel()
+        self._task = self._server_task = None
+
+    async def request(self, frames: list, timeout: float) -> dict:
+        channel = self.channel
+        if channel is None:
+            raise InferenceUnavailable(f"Inference node {self.url} is not connected")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._futures[request_id] = future
+        try:
+            await channel.send({"id": request_id, "frames": frames})
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise InferenceUnavailable(f"No reply from inference node {self.url} within {timeout:g}s")
+        except OSError:
+            # The connection dropped while the request was written
+            raise InferenceUnavailable(f"Inference node {self.url} went away")
+        finally:
+            self._futures.pop(request_id, None)
+
+
+class RemoteInferenceClient:
+    """
+    Executor-compatible client for one or more inference nodes.
+
+    With local_server set, "local" connects to that server over in-process queues;
+    the model then lives in this process but every call goes through the transport.
+    """
+
+    def __init__(self, urls, local_server: InferenceServer = None, timeout: float = INFERENCE_REMOTE_TIMEOUT_S):
+        if isinstance(urls, str):
+            urls = [url.strip() for url in urls.split(",") if url.strip()]
+        self._nodes = [_Node(url, local_server) for url in urls]
+        self.local_server = local_server
+        self.timeout = timeout
+        self.names = None
+        self.imgsz = None
+
+    async def start(self):
+        """Connect to every node and wait until the first one is up (nodes may start after the API)."""
+        for node in self._nodes:
+            node.start()
+        waiters = [asyncio.create_task(node.connected.wait()) for node in self._nodes]
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        first = next(node for node in self._nodes if node.info is not None)
+        self.names, self.imgsz = first.info["names"], first.info["imgsz"]
+        for node in self._nodes:
+            if node.info is not None and node.info["names"] != self.names:
+                print(f"WARNING: Inference node {node.url} serves different classes than {first.url}")
+
+    def _connected(self):
+        return [node for node in self._nodes if node.connected.is_set()]
+
+    @property
+    def connected(self) -> bool:
+        return bool(self._connected())
+
+    @property
+    def workers(self) -> int:
+        return sum(node.info["workers"] for node in self._nodes if node.info) or 1
+
+    @property
+    def queue_size(self) -> int:
+        return sum(node.info["queue_size"] for node in self._nodes if node.info)
+
+    @property
+    def pending(self) -> int:
+        """Requests sent to nodes and not answered yet."""
+        return sum(node.inflight for node in self._nodes)
+
+    @property
+    def load(self) -> float:
+        """Load reported by the connected nodes, weighted by their capacity; 1 if none is connected."""
+        nodes = self._connected()
+        capacity = sum(node.capacity for node in nodes)
+        if not capacity:
+            return 1.0
+        return min(1.0, sum(node.load * node.capacity for node in nodes) / capacity)
+
+    def stats(self) -> list:
+        return [
+            {"url": node.url, "connected": node.connected.is_set(), "inflight": node.inflight,
+             "load": round(node.load, 2), "workers": node.info["workers"] if node.info else None}
+            for node in self._nodes
+        ]
+
+    async def decode_and_detect_batch(self, frames):
+        """Send the frames to the least busy node. Returns one Detections (or None) per frame."""
+        nodes = self._connected()
+        if not nodes:
+            raise InferenceUnavailable("No inference node connected")
+        node = min(nodes, key=lambda n: (n.inflight / max(1, n.capacity), n.load))
+        if node.inflight >= node.capacity:
+            raise InferenceQueueFull(f"{self.pending} requests already pending")
+        reply = await node.request(list(frames), self.timeout)
+        if "error" in reply:
+            if reply.get("busy"):
+                raise InferenceQueueFull(reply["error"])
+            raise RuntimeError(f"Inference node {node.url}: {reply['error']}")
+        return [unpack_detections(packed) for packed in reply["detections"]]
+
+    async def decode_and_detect(self, data: bytes):
+        return (await self.decode_and_detect_batch([data]))[0]
+
+    async def detect(self, img):
+        # Nodes take encoded frames; PNG keeps the pixels exact
+        return await self.decode_and_detect(cv2.imencode(".png", img)[1].tobytes())
+
+    def shutdown(self):
+        for node in self._nodes:
+            node.stop()
+        if self.local_server is not None:
+            self.local_server.executor.shutdown()
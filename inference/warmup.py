@@ -0,0 +1,38 @@
+"""
+Model warm-up: dummy frames run through the full decode + inference path before a
+model is reported ready, so lazy initialization (layer fusing, allocator growth,
+thread pools) never hits a driver. Used by the API and by standalone inference nodes.
+"""
+import asyncio
+import os
+import time
+
+import cv2
+import numpy as np
+
+from inference.batching import INFERENCE_MAX_BATCH
+
+# Dummy inferences run per frame size and batch size
+INFERENCE_WARMUP_RUNS = int(os.getenv("INFERENCE_WARMUP_RUNS", 2))
+# Frame sizes to warm up (WIDTHxHEIGHT,...); default: 4:3 landscape and portrait at the model size
+INFERENCE_WARMUP_SIZES = os.getenv("INFERENCE_WARMUP_SIZES", "")
+# Batch sizes to warm up: single frames and full batches
+INFERENCE_WARMUP_BATCHES = os.getenv("INFERENCE_WARMUP_BATCHES", f"1,{INFERENCE_MAX_BATCH}")
+
+
+async def warm_up(loaded, runs: int = INFERENCE_WARMUP_RUNS) -> list:
+    """Warm every worker of an executor. Returns timings per size and batch."""
+    timings = []
+    side, short = loaded.imgsz, loaded.imgsz * 3 // 4
+    for size in (INFERENCE_WARMUP_SIZES or f"{side}x{short},{short}x{side}").split(","):
+        width, height = (int(v) for v in size.lower().split("x"))
+        frame = cv2.imencode(".jpg", np.full((height, width, 3), 114, np.uint8))[1].tobytes()
+        for batch in (int(b) for b in INFERENCE_WARMUP_BATCHES.split(",")):
+            times = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                # One call per worker, so every model copy is warmed
+                await asyncio.gather(*(loaded.decode_and_detect_batch([frame] * batch) for _ in range(loaded.workers)))
+                times.append(round((time.perf_counter() - start) * 1000, 1))
+            timings.append({"size": f"{width}x{height}", "batch": batch, "ms": times})
+    return timings
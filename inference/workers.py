@@ -0,0 +1,351 @@
+"""
+Multi-process inference: N worker processes, each with its own model copy and a
+fixed intra-op thread count, fed through shared-memory frame rings.
+
+The API process only decodes frames (cv2 releases the GIL), writes them into a free
+slot of a worker's ring and sends the slot numbers over a pipe. Pixels are never
+pickled; only the small per-frame Detections come back through the pipe.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from inference.backends import INFERENCE_BACKEND, INFERENCE_INTRA_OP_THREADS
+from inference.batching import INFERENCE_MAX_BATCH
+from inference.executor import INFERENCE_QUEUE_SIZE, InferenceQueueFull, rescale
+from inference.preprocess import INFERENCE_IMGSZ, decode_image
+
+# Number of inference processes (0 = run inference on threads in the API process)
+INFERENCE_PROCESSES = int(os.getenv("INFERENCE_PROCESSES", 0))
+# Frame slots in each worker's shared-memory ring (two full batches: one running, one being written)
+INFERENCE_SHM_SLOTS = int(os.getenv("INFERENCE_SHM_SLOTS", 2 * INFERENCE_MAX_BATCH))
+# Pin each worker to its own block of cores
+INFERENCE_PIN_CPUS = os.getenv("INFERENCE_PIN_CPUS", "false").lower() in ("1", "true", "yes")
+# Threads in the API process that decode frames into the rings
+INFERENCE_DECODE_THREADS = int(os.getenv("INFERENCE_DECODE_THREADS", 4))
+# Longest wait between attempts to restart a worker process whose model fails to load again
+INFERENCE_RESPAWN_MAX_S = float(os.getenv("INFERENCE_RESPAWN_MAX_S", 60))
+
+
+def _worker_threads(processes: int) -> int:
+    return INFERENCE_INTRA_OP_THREADS or max(1, (os.cpu_count() or 1) // processes)
+
+
+def _worker_main(index: int, backend_name: str, threads: int, pin_cpus: bool, conn):
+    # Must be set before torch / onnxruntime spin up their thread pools
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    cv2.setNumThreads(1)
+    if pin_cpus and hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        block = cpus[index * threads:(index + 1) * threads]
+        if block:
+            os.sched_setaffinity(0, block)
+
+    from inference.backends import load_backend
+
+    backend = load_backend(backend_name, threads)
+    conn.send((backend.names, backend.imgsz))
+
+    shm_name, slots, slot_bytes = conn.recv()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = np.ndarray((slots, slot_bytes), np.uint8, buffer=shm.buf)
+    images = None
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            job_id, entries = message
+            # Contiguous (h, w, 3) views straight into shared memory
+            images = [ring[slot, :h * w * 3].reshape(h, w, 3) for slot, h, w in entries]
+            try:
+                conn.send((job_id, backend.predict(images), None))
+            except Exception as e:
+                conn.send((job_id, None, repr(e)))
+    finally:
+        # Views must be gone before the mapping can be closed
+        images = ring = None
+        shm.close()
+
+
+class _Worker:
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.free = deque()
+        self.inflight = 0
+        self.alive = True
+
+
+class ProcessInferencePool:
+    """
+    Drop-in replacement for InferenceExecutor that runs the model in worker processes.
+    Jobs go to the least busy worker with enough free slots; callers wait for slots
+    when every ring is full and are rejected once the queue limit is reached.
+    """
+
+    def __init__(self, backend: str = INFERENCE_BACKEND, processes: int = INFERENCE_PROCESSES,
+                 queue_size: int = INFERENCE_QUEUE_SIZE, slots: int = INFERENCE_SHM_SLOTS):
+        self.workers = max(1, processes)
+        self.queue_size = max(0, queue_size)
+        self.slots = max(1, slots)
+        self._backend = backend
+        self._threads = _worker_threads(self.workers)
+        # spawn: forking a process that already holds torch / onnxruntime threads is unsafe
+        self._context = multiprocessing.get_context("spawn")
+        self._closing = False
+
+        self._workers = []
+        try:
+            for index in range(self.workers):
+                self._workers.append(_Worker(index, *self._start_process(index)))
+            self.names, self.imgsz = None, INFERENCE_IMGSZ
+            for worker in self._workers:
+                self.names, self.imgsz = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            self._terminate()
+            raise RuntimeError("An inference worker process could not load the model (see its output above)") from e
+        except BaseException:
+            self._terminate()
+            raise
+
+        # One ring per worker; a slot holds a frame resized to fit imgsz x imgsz
+        self._slot_bytes = self.imgsz * self.imgsz * 3
+        self._shms = []
+        self._rings = []
+        for worker in self._workers:
+            shm = shared_memory.SharedMemory(create=True, size=self.slots * self._slot_bytes)
+            self._shms.append(shm)
+            self._rings.append(np.ndarray((self.slots, self._slot_bytes), np.uint8, buffer=shm.buf))
+            worker.free.extend(range(self.slots))
+            worker.conn.send((shm.name, self.slots, self._slot_bytes))
+
+        self._decode_pool = ThreadPoolExecutor(max_workers=INFERENCE_DECODE_THREADS, thread_name_prefix="decode")
+        self._job_ids = itertools.count()
+        self._jobs = {}
+        self._waiters = deque()
+        self._pending = 0
+        self._loop = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def load(self) -> float:
+        return min(1.0, self._pending / (self.workers + self.queue_size))
+
+    def _start_process(self, index: int):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(index, self._backend, self._threads, INFERENCE_PIN_CPUS, child_conn),
+            name=f"inference-{index}", daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _terminate(self):
+        for worker in self._workers:
+            worker.process.terminate()
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+
+    def _ensure_started(self):
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            for worker in self._workers:
+                threading.Thread(target=self._read_results, args=(worker, worker.conn), daemon=True).start()
+
+    def _read_results(self, worker: _Worker, conn):
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                if not self._closing:
+                    self._loop.call_soon_threadsafe(self._worker_exited, worker)
+                return
+            self._loop.call_soon_threadsafe(self._finish_job, *message)
+
+    def _worker_exited(self, worker: _Worker):
+        worker.alive = False
+        for job_id, (job_worker, slots, future) in list(self._jobs.items()):
+            if job_worker is worker:
+                del self._jobs[job_id]
+                # The process that was reading these slots is gone
+                self._release(worker, slots)
+                if not future.done():
+                    future.set_exception(RuntimeError(f"Inference worker {worker.index} exited"))
+        self._wake()
+        print(f"WARNING: Inference worker {worker.index} exited (code {worker.process.exitcode}), starting a new one")
+        threading.Thread(target=self._respawn, args=(worker,), daemon=True).start()
+
+    def _respawn(self, worker: _Worker):
+        # Runs on its own thread: loading the model takes seconds. The new process reuses the worker's ring.
+        delay = 1.0
+        while not self._closing:
+            process, conn = self._start_process(worker.index)
+            try:
+                conn.recv()
+                conn.send((self._shms[worker.index].name, self.slots, self._slot_bytes))
+            except (EOFError, OSError) as e:
+                process.join(timeout=5)
+                print(f"WARNING: Inference worker {worker.index} failed to start ({e!r}), retrying in {delay:g}s")
+                time.sleep(delay)
+                delay = min(delay * 2, INFERENCE_RESPAWN_MAX_S)
+                continue
+            self._loop.call_soon_threadsafe(self._worker_started, worker, process, conn)
+            return
+
+    def _worker_started(self, worker: _Worker, process, conn):
+        worker.process, worker.conn = process, conn
+        if self._closing:
+            process.terminate()
+            return
+        worker.alive = True
+        threading.Thread(target=self._read_results, args=(worker, conn), daemon=True).start()
+        self._wake()
+
+    def _wake(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _release(self, worker: _Worker, slots):
+        worker.free.extend(slots)
+        worker.inflight -= 1
+        self._wake()
+
+    def _finish_job(self, job_id, detections, error):
+        job = self._jobs.pop(job_id, None)
+        if job is None:
+            return
+        worker, slots, future = job
+        # Slots are only reused once the worker is done reading them
+        self._release(worker, slots)
+        if future.done():
+            return
+        if error:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(detections)
+
+    async def _reserve(self, count: int):
+        while True:
+            ready = [w for w in self._workers if w.alive and len(w.free) >= count]
+            if ready:
+                worker = min(ready, key=lambda w: w.inflight)
+                worker.inflight += 1
+                return worker, [worker.free.popleft() for _ in range(count)]
+            if not any(w.alive for w in self._workers):
+                raise RuntimeError("No inference worker running (restarting)")
+            waiter = self._loop.create_future()
+            self._waiters.append(waiter)
+            await waiter
+
+    def _write_frame(self, ring_slot: np.ndarray, frame, decode: bool):
+        """Decode (if needed) and write one frame into a ring slot. Returns (h, w, scale) or None."""
+        if decode:
+            img, scale = decode_image(frame, self.imgsz)
+            if img is None:
+                return None
+        else:
+            img, scale = frame, 1.0
+        h, w = img.shape[:2]
+        ratio = min(self.imgsz / h, self.imgsz / w)
+        if ratio < 1:
+            # Same resize the letterbox would do, so the worker only has to pad
+            new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+            dst = ring_slot[:new_h * new_w * 3].reshape(new_h, new_w, 3)
+            cv2.resize(img, (new_w, new_h), dst=dst, interpolation=cv2.INTER_LINEAR)
+            return new_h, new_w, scale / ratio
+        ring_slot[:h * w * 3].reshape(h, w, 3)[...] = img
+        return h, w, scale
+
+    def _write_frames(self, worker: _Worker, slots, frames, decode: bool):
+        ring = self._rings[worker.index]
+        return [self._write_frame(ring[slot], frame, decode) for slot, frame in zip(slots, frames)]
+
+    async def _dispatch(self, worker: _Worker, slots, frames, decode: bool):
+        try:
+            written = await self._loop.run_in_executor(self._decode_pool, self._write_frames, worker, slots, frames, decode)
+        except Exception:
+            # Nothing was sent to the worker, so the slots can be reused right away
+            self._release(worker, slots)
+            raise
+        entries = [(slot, meta[0], meta[1]) for slot, meta in zip(slots, written) if meta is not None]
+        if not entries or not worker.alive:
+            self._release(worker, slots)
+            if not worker.alive:
+                raise RuntimeError(f"Inference worker {worker.index} exited")
+            return [None] * len(frames)
+
+        job_id = next(self._job_ids)
+        future = self._loop.create_future()
+        self._jobs[job_id] = (worker, slots, future)
+        try:
+            worker.conn.send((job_id, entries))
+        except OSError:
+            # The process died before its reader thread noticed
+            del self._jobs[job_id]
+            self._release(worker, slots)
+            raise RuntimeError(f"Inference worker {worker.index} exited")
+        detections = iter(await future)
+        return [rescale(next(detections), meta[2]) if meta is not None else None for meta in written]
+
+    async def _submit(self, frames: list, decode: bool):
+        self._ensure_started()
+        if len(frames) > self.slots:
+            raise ValueError(f"Batch of {len(frames)} frames does not fit in {self.slots} slots")
+        if self._pending >= self.workers + self.queue_size:
+            raise InferenceQueueFull(f"{self._pending} jobs already pending")
+        self._pending += 1
+        try:
+            worker, slots = await self._reserve(len(frames))
+            # Once slots are taken, finish the job even if the caller goes away,
+            # so a slot is never rewritten while a worker is reading it
+            return await asyncio.shield(self._dispatch(worker, slots, frames, decode))
+        finally:
+            self._pending -= 1
+
+    async def detect(self, img):
+        """Run inference on an already decoded BGR image."""
+        return (await self._submit([img], decode=False))[0]
+
+    async def decode_and_detect(self, data: bytes):
+        """Decode encoded image bytes and run inference. Returns None if the bytes are not an image."""
+        return (await self._submit([data], decode=True))[0]
+
+    async def decode_and_detect_batch(self, frames):
+        """Decode a list of encoded frames and run them as one batch on one worker."""
+        return await self._submit(frames, decode=True)
+
+    def shutdown(self):
+        if self._closing:
+            return
+        self._closing = True
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self._decode_pool.shutdown(wait=False, cancel_futures=True)
+        self._rings.clear()
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,181 @@
+"""
+Write-behind buffer for detection logs.
+
+Log endpoints queue rows here and answer right away; a background task writes them
+as one multi-row INSERT when LOG_BUFFER_MAX_ROWS are queued or LOG_BUFFER_MAX_DELAY_MS
+has passed, whichever comes first. Queued rows are flushed on shutdown, so only a
+crash of the process can lose them (at most the last LOG_BUFFER_MAX_DELAY_MS of logs).
+
+If the database is unreachable, rows stay queued (up to LOG_BUFFER_MAX_PENDING) and are
+retried. If it rejects the batch, rows are written one by one and those it still
+rejects are dropped with a warning, so one bad row never holds up the others.
+
+/ai/ws/detect?log=true writes status changes of the stream through the same kind of buffer.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+import crud
+import schemas
+from database import SessionLocal
+
+# Off by default: logs are then written within the request, as before
+LOG_BUFFER_ENABLED = os.getenv("LOG_BUFFER_ENABLED", "false").lower() in ("1", "true", "yes")
+# Flush as soon as this many rows are queued
+LOG_BUFFER_MAX_ROWS = int(os.getenv("LOG_BUFFER_MAX_ROWS", 500))
+# Longest a queued row waits before it is written (the durability bound)
+LOG_BUFFER_MAX_DELAY_MS = int(os.getenv("LOG_BUFFER_MAX_DELAY_MS", 1000))
+# Requests wait for a flush instead of queueing more than this (also caps rows kept after failed flushes)
+LOG_BUFFER_MAX_PENDING = int(os.getenv("LOG_BUFFER_MAX_PENDING", 10000))
+
+# Failures worth retrying: the database is unreachable, not the rows themselves
+_TRANSIENT_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError, OSError)
+
+
+class DetectionLogBuffer:
+    def __init__(self, max_rows: int = LOG_BUFFER_MAX_ROWS, max_delay_ms: int = LOG_BUFFER_MAX_DELAY_MS,
+                 max_pending: int = LOG_BUFFER_MAX_PENDING):
+        self.max_rows = max(1, max_rows)
+        self.max_delay = max(1, max_delay_ms) / 1000
+        self.max_pending = max(self.max_rows, max_pending)
+        self._rows = []
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._stopping = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._rows)
+
+    async def add(self, trip_id: int, log: schemas.DetectionLogCreate) -> dict:
+        """Queue one log and return the row that will be written."""
+        if len(self._rows) >= self.max_pending:
+            await self.flush()
+        row = log.model_dump()
+        row["trip_id"] = trip_id
+        # Stamped now rather than at flush time, so the time is when the detection arrived
+        row["timestamp"] = row.get("timestamp") or datetime.now()
+        self._rows.append(row)
+        if len(self._rows) >= self.max_rows:
+            self._wakeup.set()
+        return row
+
+    def _requeue(self, rows: list, error: Exception):
+        # Keep the rows for the next flush, newest first to go if the queue overflows
+        queued = rows + self._rows
+        self._rows = queued[:self.max_pending]
+        dropped = len(queued) - len(self._rows)
+        print(f"WARNING: Failed to write {len(rows)} detection logs, will retry: {error}"
+              + (f" ({dropped} dropped)" if dropped else ""))
+
+    async def _write_each(self, rows: list) -> int:
+        """Write rows one at a time after a batch was rejected; rows the database refuses are dropped."""
+        written = 0
+        for i, row in enumerate(rows):
+            try:
+                async with SessionLocal() as db:
+                    written += await crud.create_detection_logs(db, [row])
+            except _TRANSIENT_ERRORS as e:
+                self._requeue(rows[i:], e)
+                break
+            except Exception as e:
+                print(f"WARNING: Dropped detection log for trip {row.get('trip_id')} "
+                      f"({row.get('event_type')!r} at {row.get('timestamp')}): {getattr(e, 'orig', None) or e}")
+        return written
+
+    async def flush(self) -> int:
+        """Write every queued row. Returns the number of rows written."""
+        async with self._lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                async with SessionLocal() as db:
+                    return await crud.create_detection_logs(db, rows)
+            except _TRANSIENT_ERRORS as e:
+                self._requeue(rows, e)
+                return 0
+            except Exception:
+                # One bad row (IntegrityError, DataError, ...) fails the whole multi-row INSERT;
+                # retrying the batch as is would block every log queued after it
+                return await self._write_each(rows)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and write what is still queued. Safe to call twice."""
+        if self._task is not None:
+            # Not cancelled: a flush in progress has already taken its rows off the queue,
+            # so it must be allowed to finish (or requeue them) before the last flush
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+class StreamEventLogger:
+    """
+    Logs the filtered status of one inference stream to the user's active trip.
+
+    Only changes are written: a drowsy episode reported on every frame becomes one
+    log when it starts, and the next one is logged once the status has changed.
+    """
+
+    # The active trip is looked up again at most this often (seconds): a trip ended while the
+    # stream stays open gets no more logs, and the next trip started gets them instead
+    TRIP_CHECK_S = 5.0
+
+    def __init__(self, buffer: DetectionLogBuffer, user_id: int, trip_id: int = None, ignore=("awake",)):
+        self.buffer = buffer
+        self.user_id = user_id
+        self.trip_id = trip_id
+        self.ignore = ignore
+        self.logged = 0
+        self._last = None
+        # A trip passed in was just looked up by the caller
+        self._check_at = time.monotonic() + self.TRIP_CHECK_S if trip_id is not None else 0.0
+
+    async def _active_trip(self):
+        if time.monotonic() >= self._check_at:
+            self._check_at = time.monotonic() + self.TRIP_CHECK_S
+            async with SessionLocal() as db:
+                trip = await crud.get_active_trip(db, user_id=self.user_id)
+            self.trip_id = trip.trip_id if trip else None
+        return self.trip_id
+
+    async def record(self, status: str, confidence: float) -> bool:
+        """Queue a log if the status changed to one worth logging. Returns whether it was queued."""
+        if status == self._last:
+            return False
+        self._last = status
+        if status in self.ignore:
+            return False
+        if await self._active_trip() is None:
+            return False
+        log = schemas.DetectionLogCreate(event_type=status, confidence=round(confidence, 2))
+        await self.buffer.add(self.trip_id, log)
+        self.logged += 1
+        return True
+
+
+log_buffer = DetectionLogBuffer() if LOG_BUFFER_ENABLED else None
+# WebSocket streams always write through a buffer, the shared one when it is enabled
+stream_log_buffer = log_buffer if log_buffer is not None else DetectionLogBuffer()
@@ -1,7 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from routers import users, contacts, trips
-from database import engine, Base
+from sqlalchemy import text
+from database import engine, create_schema, DB_CREATE_SCHEMA, DB_QUERY_STATS, QueryStats, request_query_stats, request_path
 
 app = FastAPI(title="Drowsiness Detection API")
 
@@ -16,13 +18,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create tables on startup (For development only, use Alembic for production)
+@app.middleware("http")
+async def query_stats(request: Request, call_next):
+    # Count the statements of this request (see database.py), for the slow-query log and headers
+    stats = QueryStats()
+    stats_token = request_query_stats.set(stats)
+    path_token = request_path.set(f"{request.method} {request.url.path}")
+    try:
+        response = await call_next(request)
+    finally:
+        request_query_stats.reset(stats_token)
+        request_path.reset(path_token)
+    if DB_QUERY_STATS:
+        response.headers["X-DB-Queries"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.seconds * 1000:.1f}"
+    return response
+
+# Create tables on startup (For development only, use Alembic for production: DB_CREATE_SCHEMA=false)
 @app.on_event("startup")
 async def startup():
-    from database import create_database_if_not_exists
-    await create_database_if_not_exists()
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    if DB_CREATE_SCHEMA:
+        await create_schema()
 
 app.include_router(users.router)
 app.include_router(contacts.router)
@@ -37,3 +53,32 @@ app.include_router(ai_detection.router)
 @app.get("/")
 async def root():
     return {"message": "Drowsiness Detection API is running"}
+
+@app.get("/ready")
+async def ready():
+    # The API is ready once the database answers; the model may still be loading (see /ai/ready)
+    from routers.ai_detection import model_state
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        database_state = "ok"
+    except Exception as e:
+        database_state = f"error: {e.__class__.__name__}"
+    body = {"database": database_state, "model": model_state}
+    if database_state != "ok":
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+@app.get("/stats")
+async def stats():
+    # Queue state of the CPU-bound pools, to spot saturation during bursts
+    from auth import password_hasher
+    pool = engine.pool
+    return {
+        "password_hashing": password_hasher.stats(),
+        "database_pool": {
+            "size": pool.size(),
+            "open": pool.checkedin() + pool.checkedout(),
+            "checked_out": pool.checkedout(),
+        },
+    }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Enum, BigInteger
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, ForeignKey, Float, Enum, BigInteger, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -45,6 +45,11 @@ class Trip(Base):
     driver = relationship("User", back_populates="trips")
     logs = relationship("DetectionLog", back_populates="trip")
 
+    __table_args__ = (
+        # Trips of a user in a date range (statistics, trip history)
+        Index("ix_trips_user_id_start_time", "user_id", "start_time"),
+    )
+
 class DetectionLog(Base):
     __tablename__ = "detection_logs"
 
@@ -55,5 +60,28 @@ class DetectionLog(Base):
     event_type = Column(String(50), nullable=False) 
     confidence = Column(Float, nullable=False)
     gps_location = Column(String(50), nullable=True)
+    # Idempotency key chosen by the client, so replayed uploads are stored once
+    client_event_id = Column(String(64), nullable=True)
 
     trip = relationship("Trip", back_populates="logs")
+
+    __table_args__ = (
+        # Logs of a trip in time order (trip details, per-trip counts), and counts by
+        # trip and event type (covering index of the rollup rebuild and check)
+        Index("ix_detection_logs_trip_id_timestamp", "trip_id", "timestamp"),
+        Index("ix_detection_logs_trip_id_event_type", "trip_id", "event_type"),
+        Index("uq_detection_logs_trip_id_client_event_id", "trip_id", "client_event_id", unique=True),
+    )
+
+class DailyStats(Base):
+    __tablename__ = "daily_stats"
+
+    # Per-user, per-day rollup filled by its migration and kept up to date by crud (see rollup.py).
+    # Days are the trip's start day. Rows with event_type "" hold the trip count and driving
+    # minutes of that day; the other rows hold the detection count of one event type.
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    event_type = Column(String(50), primary_key=True)
+    detection_count = Column(Integer, nullable=False, default=0)
+    trip_count = Column(Integer, nullable=False, default=0)
+    driving_minutes = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,121 @@
+"""
+Rebuild or check the daily_stats rollup against the raw trips and detection_logs tables.
+
+    python -m rollup rebuild             # all users
+    python -m rollup rebuild --user 42
+    python -m rollup check               # exits with status 1 if the rollup drifted
+
+The rollup is filled by the migration that adds it, then maintained by crud as trips and
+logs are written. Rebuild while no trips are being written for the users concerned, or
+their new rows may be counted twice.
+"""
+import argparse
+import asyncio
+import sys
+
+from sqlalchemy import delete, literal, select, func
+
+import models
+from crud import TRIP_EVENT, minutes_between
+from database import SessionLocal, engine
+
+COLUMNS = ["user_id", "day", "event_type", "detection_count", "trip_count", "driving_minutes"]
+
+
+def _trip_rows(user_id: int = None):
+    day = func.date(models.Trip.start_time)
+    query = (
+        select(
+            models.Trip.user_id, day, literal(TRIP_EVENT), literal(0),
+            func.count(models.Trip.trip_id),
+            func.coalesce(func.sum(minutes_between(models.Trip.start_time, models.Trip.end_time)), 0),
+        )
+        .group_by(models.Trip.user_id, day)
+    )
+    if user_id is not None:
+        query = query.where(models.Trip.user_id == user_id)
+    return query
+
+
+def _detection_rows(user_id: int = None):
+    # Detections are counted on their trip's start day, like the incremental updates
+    day = func.date(models.Trip.start_time)
+    query = (
+        select(
+            # count(*) is answered from ix_detection_logs_trip_id_event_type alone
+            models.Trip.user_id, day, models.DetectionLog.event_type,
+            func.count(), literal(0), literal(0),
+        )
+        .join(models.Trip, models.DetectionLog.trip_id == models.Trip.trip_id)
+        .group_by(models.Trip.user_id, day, models.DetectionLog.event_type)
+    )
+    if user_id is not None:
+        query = query.where(models.Trip.user_id == user_id)
+    return query
+
+
+async def rebuild(db, user_id: int = None) -> int:
+    """Recompute the rollup from the raw tables. Returns the number of rows written."""
+    table = models.DailyStats.__table__
+    clear = delete(table)
+    if user_id is not None:
+        clear = clear.where(table.c.user_id == user_id)
+    await db.execute(clear)
+    for rows in (_trip_rows(user_id), _detection_rows(user_id)):
+        await db.execute(table.insert().from_select(COLUMNS, rows))
+    await db.commit()
+
+    count = select(func.count()).select_from(table)
+    if user_id is not None:
+        count = count.where(table.c.user_id == user_id)
+    return (await db.execute(count)).scalar()
+
+
+async def check(db, user_id: int = None) -> list:
+    """Differences between the rollup and the raw tables, as (key, expected, actual) tuples."""
+    def by_key(rows):
+        # Dates come back as strings from SQLite's date(), normalize keys to "YYYY-MM-DD"
+        return {(u, str(day), event_type): tuple(int(v) for v in values) for u, day, event_type, *values in rows}
+
+    expected = {}
+    for rows in (_trip_rows(user_id), _detection_rows(user_id)):
+        expected.update(by_key((await db.execute(rows)).all()))
+
+    table = models.DailyStats.__table__
+    query = select(*(table.c[name] for name in COLUMNS))
+    if user_id is not None:
+        query = query.where(table.c.user_id == user_id)
+    actual = by_key((await db.execute(query)).all())
+
+    return [
+        (key, expected.get(key), actual.get(key))
+        for key in sorted(expected.keys() | actual.keys())
+        if expected.get(key) != actual.get(key)
+    ]
+
+
+async def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m rollup", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--user", type=int, default=None, help="Only this user_id")
+    args = parser.parse_args(argv)
+
+    try:
+        async with SessionLocal() as db:
+            if args.command == "rebuild":
+                rows = await rebuild(db, args.user)
+                print(f"Rebuilt daily_stats: {rows} rows")
+                return 0
+
+            mismatches = await check(db, args.user)
+            for (user, day, event_type), expected, actual in mismatches:
+                label = event_type or "(trips)"
+                print(f"user {user} {day} {label}: expected {expected}, rollup has {actual}")
+            print(f"{len(mismatches)} mismatching rows" if mismatches else "daily_stats is consistent")
+            return 1 if mismatches else 0
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,144 +1,374 @@
-from fastapi import APIRouter, UploadFile, File, WebSocket, WebSocketDisconnect
-from ultralytics import YOLO
-import cv2
-import numpy as np
+from fastapi import APIRouter, UploadFile, File, WebSocket, WebSocketDisconnect, HTTPException, Query, status as http_status
+from fastapi.responses import JSONResponse
+from inference.executor import InferenceExecutor, InferenceQueueFull
+from inference.batching import BatchScheduler
+from inference.workers import INFERENCE_PROCESSES, ProcessInferencePool
+from inference.transport import INFERENCE_TRANSPORT, InferenceServer, RemoteInferenceClient
+from inference.warmup import INFERENCE_WARMUP_RUNS, warm_up
+from inference.backends import INFERENCE_BACKEND, model_path
+from inference.temporal import TemporalFilter
+from inference.rate_control import recommend
+from inference import protocol, results
+from database import SessionLocal
+from log_buffer import StreamEventLogger, stream_log_buffer
+import auth, crud
+import asyncio
 import base64
 import json
 import os
-from typing import List
+import time
+from typing import List, Optional
 
 router = APIRouter(
     prefix="/ai",
     tags=["ai_detection"],
 )
 
-# Load Model
-MODEL_PATH = "access/best.pt"
-# Check if model exists
-if not os.path.exists(MODEL_PATH):
-    print(f"WARNING: Model not found at {MODEL_PATH}. AI endpoints will fail.")
-    model = None
-else:
-    model = YOLO(MODEL_PATH)
+# Model (INFERENCE_BACKEND selects torch, onnx or openvino)
+MODEL_PATH = model_path(INFERENCE_BACKEND)
+
+# The model is loaded in the background after startup, so the other routers serve
+# traffic right away. State for /ai/ready: loading, warming, ready, missing or failed.
+# With INFERENCE_TRANSPORT set to node URLs, no model is loaded here: "loading" lasts
+# until the first inference node is connected, and the nodes warm themselves up.
+model_state = "loading"
+executor = None
+scheduler = None
+status_levels = None
+warmup_timings = []
+_model_loader = None
+_shutting_down = False
+
+def _create_executor():
+    global model_state
+    if not os.path.exists(MODEL_PATH):
+        print(f"WARNING: Model not found at {MODEL_PATH}. AI endpoints will fail.")
+        model_state = "missing"
+        return None
+    try:
+        # Inference runs on a dedicated thread pool (or worker processes), handlers only await it.
+        # Frames from all connections are grouped into batches before reaching the pool.
+        if INFERENCE_PROCESSES > 0:
+            return ProcessInferencePool(INFERENCE_BACKEND, INFERENCE_PROCESSES)
+        return InferenceExecutor(INFERENCE_BACKEND)
+    except Exception as e:
+        print(f"WARNING: Could not load model {MODEL_PATH}: {e}. AI endpoints will fail.")
+        model_state = "failed"
+        return None
+
+def _remote() -> bool:
+    return bool(INFERENCE_TRANSPORT) and INFERENCE_TRANSPORT != "local"
+
+async def _load_model():
+    global executor, scheduler, status_levels, model_state, warmup_timings
+    if _remote():
+        loaded = RemoteInferenceClient(INFERENCE_TRANSPORT)
+        try:
+            await loaded.start()
+        except asyncio.CancelledError:
+            loaded.shutdown()
+            raise
+    else:
+        loaded = await asyncio.to_thread(_create_executor)
+        if loaded is None:
+            return
+        if INFERENCE_TRANSPORT == "local":
+            # The model stays in this process but every call goes through the transport
+            loaded = RemoteInferenceClient("local", local_server=InferenceServer(loaded))
+            await loaded.start()
+    if INFERENCE_WARMUP_RUNS > 0 and not _remote():
+        model_state = "warming"
+        start = time.perf_counter()
+        try:
+            warmup_timings = await warm_up(loaded)
+            print(f"Model warm-up done in {time.perf_counter() - start:.1f}s: {json.dumps(warmup_timings)}")
+        except Exception as e:
+            print(f"WARNING: Model warm-up failed: {e}")
+    if _shutting_down:
+        loaded.shutdown()
+        return
+    # Handlers check `executor`, so it is published last
+    status_levels = results.status_levels(loaded.names)
+    scheduler = BatchScheduler(loaded)
+    executor = loaded
+    model_state = "ready"
+
+@router.on_event("startup")
+async def start_model_loader():
+    global _model_loader
+    if _model_loader is None:
+        _model_loader = asyncio.create_task(_load_model())
+
+@router.on_event("shutdown")
+async def shutdown_executor():
+    global _shutting_down
+    _shutting_down = True
+    if _remote() and _model_loader is not None and not _model_loader.done():
+        # Still waiting for the first inference node
+        _model_loader.cancel()
+    if executor is not None:
+        await scheduler.stop()
+        executor.shutdown()
+
+def _model_unavailable() -> str:
+    return "Model is loading" if model_state in ("loading", "warming") else "Model not loaded"
+
+@router.get("/ready")
+async def ready():
+    """200 once the model is loaded and warmed up, 503 before that or if it could not be loaded."""
+    body = {"model": model_state, "backend": INFERENCE_BACKEND, "warmup": warmup_timings}
+    if isinstance(executor, RemoteInferenceClient):
+        body["transport"] = INFERENCE_TRANSPORT
+        body["nodes"] = executor.stats()
+        if not executor.connected:
+            return JSONResponse(status_code=503, content=body)
+    if model_state != "ready":
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+@router.on_event("startup")
+async def start_stream_log_buffer():
+    stream_log_buffer.start()
+
+@router.on_event("shutdown")
+async def stop_stream_log_buffer():
+    await stream_log_buffer.stop()
+
+def _class_ids(classes: Optional[str]):
+    # "drowsy,yawn" -> [2, 6]; unknown labels are ignored
+    if not classes:
+        return None
+    wanted = {label.strip() for label in classes.split(",")}
+    return [i for i, label in executor.names.items() if label in wanted]
 
 @router.post("/detect")
-async def detect_image(file: UploadFile = File(...)):
+async def detect_image(
+    file: UploadFile = File(...),
+    min_confidence: float = Query(0.0, ge=0, le=1),
+    classes: Optional[str] = Query(None, description="Comma-separated labels to keep, e.g. drowsy,yawn"),
+):
     """
     Detect drowsiness from an uploaded image file.
     Returns JSON with detected classes and bounding boxes.
     """
-    if model is None:
+    if executor is None:
+        if model_state in ("loading", "warming"):
+            raise HTTPException(status_code=503, detail=_model_unavailable(), headers={"Retry-After": "5"})
         return {"error": "Model not loaded"}
     
     # Read image
     contents = await file.read()
-    nparr = np.frombuffer(contents, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    if img is None:
-        return {"error": "Invalid image"}
 
-    # Inference
-    results = model(img)
+    # Decode + inference off the event loop
+    try:
+        det = await scheduler.submit(contents)
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail="Inference queue is full, try again later")
+
+    if det is None:
+        return {"error": "Invalid image"}
     
-    # Process results
-    detections = []
-    for r in results:
-        for box in r.boxes:
-            # box.xyxy[0] is tensor, convert to list
-            coords = box.xyxy[0].tolist() 
-            conf = float(box.conf[0])
-            cls_id = int(box.cls[0])
-            label = model.names[cls_id]
-            
-            detections.append({
-                "label": label,
-                "confidence": round(conf, 2),
-                "box": [int(x) for x in coords] # [x1, y1, x2, y2]
-            })
-            
-    return {"detections": detections}
+    det = results.filter_detections(det, min_confidence, _class_ids(classes))
+    return {"detections": results.to_json(det, executor.names)}
+
+class LatestFrameSlot:
+    """
+    Holds only the newest undecoded frame of a connection.
+    A frame that is replaced before it was processed is counted as dropped.
+    """
+
+    def __init__(self):
+        self._frame = None
+        self._closed = False
+        self._event = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, frame: bytes):
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self._event.set()
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+    async def get(self):
+        """Wait for the newest frame. Returns (frame, frames dropped since the previous get)."""
+        while self._frame is None:
+            if self._closed:
+                raise WebSocketDisconnect()
+            self._event.clear()
+            await self._event.wait()
+        frame, self._frame = self._frame, None
+        dropped, self.dropped = self.dropped, 0
+        return frame, dropped
+
+async def _stream_event_logger(websocket: WebSocket, token: Optional[str]):
+    """
+    Authenticate a logging stream with the token from the query string or, if there is
+    none, from a first text message {"token": "..."}. Closes the socket and returns None
+    if the token is missing or invalid.
+    """
+    if token is None:
+        try:
+            token = json.loads(await websocket.receive_text()).get("token")
+        except WebSocketDisconnect:
+            return None
+        except (ValueError, AttributeError, KeyError):
+            token = None
+    try:
+        if not token:
+            raise HTTPException(status_code=http_status.HTTP_401_UNAUTHORIZED)
+        async with SessionLocal() as db:
+            user = await auth.get_user_from_token(token, db)
+            trip = await crud.get_active_trip(db, user_id=user.user_id)
+    except HTTPException:
+        await websocket.close(code=1008, reason="Could not validate credentials")
+        return None
+    return StreamEventLogger(stream_log_buffer, user.user_id, trip.trip_id if trip else None)
+
+async def _receive_frame(websocket: WebSocket) -> bytes:
+    """Next binary frame. A text message is not a frame: the socket is closed with 1003 (unsupported data)."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    if message.get("bytes") is None:
+        await websocket.close(code=1003, reason="Frames must be sent as binary messages")
+        raise WebSocketDisconnect(1003)
+    return message["bytes"]
+
+async def _read_latest_frames(websocket: WebSocket, slot: LatestFrameSlot):
+    # Keep draining the socket while inference runs so stale frames never queue up
+    try:
+        while True:
+            slot.put(await _receive_frame(websocket))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        slot.close()
 
 @router.websocket("/ws/detect")
-async def websocket_detect(websocket: WebSocket):
+async def websocket_detect(
+    websocket: WebSocket,
+    mode: str = Query("all", pattern="^(all|latest)$"),
+    min_confidence: float = Query(0.0, ge=0, le=1),
+    classes: Optional[str] = None,
+    log: bool = False,
+    token: Optional[str] = None,
+):
     """
     WebSocket endpoint for real-time detection.
     Client sends: Bytes (Image)
     Server responds: JSON (Detections)
+
+    mode=all (default) processes every frame in order.
+    mode=latest only processes the newest frame and reports how many were skipped,
+    so alerts stay real-time when the client sends faster than inference runs.
+
+    min_confidence and classes filter the detections before the status is computed.
+    "status" is smoothed across frames per connection; "raw_status" is this frame alone.
+
+    Clients may offer the drowsiness.struct.v1 or drowsiness.msgpack.v1 subprotocol
+    to get compact binary responses instead of JSON (see inference/protocol.py).
+
+    log=true records status changes to the driver's active trip, so the client does not
+    have to call /trips/detections itself. The access token goes in the token query
+    parameter or in a first text message {"token": "..."}.
     """
-    await websocket.accept()
+    response_format = protocol.negotiate(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=None if response_format == protocol.JSON else response_format)
+
+    event_logger = None
+    if log:
+        event_logger = await _stream_event_logger(websocket, token)
+        if event_logger is None:
+            return
+
+    encode = protocol.ENCODERS.get(response_format)
+    if event_logger is not None and encode is None:
+        # Binary clients get this in the names message instead, so they only see one preamble
+        await websocket.send_json({"logging": {"trip_id": event_logger.trip_id}})
+    temporal = class_filter = label_ids = None
+
+    async def setup_model_state():
+        # Needs the model's class names: done on connect, or at the first frame once a loading model is ready
+        nonlocal temporal, class_filter, label_ids
+        # Per-connection history so one noisy frame doesn't flip the alert
+        temporal = TemporalFilter(executor.names)
+        class_filter = _class_ids(classes)
+        if encode is not None:
+            # Binary responses carry class ids; tell the client what they mean once
+            preamble = {"protocol": response_format, "names": executor.names}
+            if event_logger is not None:
+                preamble["logging"] = {"trip_id": event_logger.trip_id}
+            await websocket.send_json(preamble)
+            label_ids = {label: i for i, label in executor.names.items()}
+
+    if executor is not None:
+        await setup_model_state()
+
+    slot = None
+    reader = None
+    if mode == "latest":
+        slot = LatestFrameSlot()
+        reader = asyncio.create_task(_read_latest_frames(websocket, slot))
+
     try:
         while True:
             # Receive image bytes
-            data = await websocket.receive_bytes()
+            dropped = 0
+            if slot is None:
+                data = await _receive_frame(websocket)
+            else:
+                data, dropped = await slot.get()
             
-            if model is None:
-                await websocket.send_json({"error": "Model not loaded"})
+            if executor is None:
+                await websocket.send_json({"error": _model_unavailable()})
                 continue
+            if temporal is None:
+                await setup_model_state()
 
-            # Convert bytes to numpy array
-            nparr = np.frombuffer(data, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Decode + batched inference on the executor so other connections keep running
+            try:
+                det = await scheduler.submit(data)
+            except InferenceQueueFull:
+                await websocket.send_json({"error": "Server busy"})
+                continue
 
-            if img is None:
+            if det is None:
                 await websocket.send_json({"error": "Invalid frame"})
                 continue
             
-            # Inference (stream=True for speed)
-            results = model(img, verbose=False) # verbose=False to reduce logs
-            
-            detections = []
-            status = "awake" # Default status
+            det = results.filter_detections(det, min_confidence, class_filter)
+            detected_label = results.frame_status(det, executor.names, status_levels)
             
-            # Logic to determine driver status based on detection priority
-            # Priority: Drowsy > Head Drop > Yawn > Phone > Distracted > Awake
-            has_drowsy = False
-            has_head_drop = False
-            
-            for r in results:
-                for box in r.boxes:
-                    coords = box.xyxy[0].tolist()
-                    conf = float(box.conf[0])
-                    cls_id = int(box.cls[0])
-                    label = model.names[cls_id]
-                    
-                    if label == "drowsy": has_drowsy = True
-                    if label == "head drop": has_head_drop = True
-                    
-                    detections.append({
-                        "label": label,
-                        "confidence": round(conf, 2),
-                        "box": [int(x) for x in coords]
-                    })
-            
-            # Priority: Drowsy > Head Drop > Yawn > Phone > Distracted > Awake
-            detected_label = "awake" # Default
+            status = temporal.update(det)
+            if event_logger is not None:
+                await event_logger.record(status, temporal.confidence(status))
+            recommended = recommend(temporal, executor.load, executor.imgsz)
 
-            # Sort detections by priority or just check flags.
-            # We want the specific label name as status.
-            
-            # Check for high priority
-            for d in detections:
-                 lbl = d['label']
-                 if lbl in ["drowsy", "head drop"]:
-                     detected_label = lbl
-                     break # Stop if found critical
-            
-            # If no critical, check secondary
-            if detected_label == "awake":
-                 for d in detections:
-                      lbl = d['label']
-                      if lbl in ["yawn", "phone", "distracted"]:
-                          detected_label = lbl
-                          break
-            
-            status = detected_label
-            
-            # Send result back
-            await websocket.send_json({
+            if encode is not None:
+                # Binary payload straight from the detection arrays, no per-box dicts
+                await websocket.send_bytes(encode(
+                    det, label_ids.get(status, 255), label_ids.get(detected_label, 255),
+                    temporal.perclos, recommended, dropped,
+                ))
+                continue
+
+            response = {
                 "status": status,
-                "detections": detections
-            })
+                "raw_status": detected_label,
+                "perclos": round(temporal.perclos, 2),
+                "detections": results.to_json(det, executor.names),
+                # Clients should wait interval_ms before the next frame and scale it to resolution
+                "recommended": recommended
+            }
+            if slot is not None:
+                response["dropped_frames"] = dropped
+
+            # Send result back
+            await websocket.send_json(response)
             
     except WebSocketDisconnect:
         print("Client disconnected")
@@ -148,3 +378,6 @@ async def websocket_detect(websocket: WebSocket):
             await websocket.close()
         except:
             pass
+    finally:
+        if reader is not None:
+            reader.cancel()
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-import crud, models, schemas, auth
+import crud, schemas, auth
 from database import get_db
 
 router = APIRouter(
@@ -12,14 +12,14 @@ router = APIRouter(
 @router.post("/", response_model=schemas.ContactResponse)
 async def create_contact(
     contact: schemas.ContactCreate,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.Principal = Depends(auth.get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     return await crud.create_contact(db=db, contact=contact, user_id=current_user.user_id)
 
 @router.get("/", response_model=List[schemas.ContactResponse])
 async def read_contacts(
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.Principal = Depends(auth.get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     return await crud.get_contacts(db=db, user_id=current_user.user_id)
@@ -27,7 +27,7 @@ async def read_contacts(
 @router.delete("/{contact_id}")
 async def delete_contact(
     contact_id: int,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.Principal = Depends(auth.get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     success = await crud.delete_contact(db=db, contact_id=contact_id, user_id=current_user.user_id)
@@ -39,7 +39,7 @@ async def delete_contact(
 async def update_contact(
     contact_id: int,
     contact_update: schemas.ContactUpdate,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.Principal = Depends(auth.get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     updated_contact = await crud.update_contact(
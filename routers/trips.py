@@ -1,16 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import os
+from datetime import datetime
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 import crud, models, schemas, auth
 from database import get_db
+from log_buffer import log_buffer
+
+# Most logs accepted by one POST /trips/{trip_id}/logs/batch
+LOG_BATCH_MAX_ITEMS = int(os.getenv("LOG_BATCH_MAX_ITEMS", 20000))
+# Largest body accepted by it, checked before the body is read (a full batch of JSON logs is a few MB)
+LOG_BATCH_MAX_BYTES = int(os.getenv("LOG_BATCH_MAX_BYTES", 16 << 20))
+
+_log_list = TypeAdapter(List[schemas.DetectionLogCreate])
 
 router = APIRouter(
     prefix="/trips",
     tags=["trips"],
 )
 
+@router.on_event("startup")
+async def start_log_buffer():
+    if log_buffer is not None:
+        log_buffer.start()
+
+@router.on_event("shutdown")
+async def stop_log_buffer():
+    if log_buffer is not None:
+        await log_buffer.stop()
+
+async def _save_log(db: AsyncSession, log: schemas.DetectionLogCreate, trip_id: int, response: Response):
+    if log_buffer is None:
+        return await crud.create_detection_log(db=db, log=log, trip_id=trip_id)
+    # Write-behind: acknowledge now, the row is inserted with the next batch (no log_id yet)
+    response.status_code = 202
+    return schemas.DetectionLogResponse(**await log_buffer.add(trip_id, log))
+
+def _parse_log_batch(content_type: str, body: bytes) -> list:
+    # application/json: [{...}, ...]; NDJSON: one object per line;
+    # MessagePack: an array of maps or a stream of maps
+    if content_type in ("application/json", ""):
+        return _log_list.validate_json(body)
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return _log_list.validate_python([json.loads(line) for line in body.splitlines() if line.strip()])
+    if content_type in ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack"):
+        import msgpack
+
+        items = []
+        unpacker = msgpack.Unpacker(raw=False)
+        unpacker.feed(body)
+        try:
+            for obj in unpacker:
+                if isinstance(obj, list):
+                    items.extend(obj)
+                else:
+                    items.append(obj)
+        except (ValueError, msgpack.UnpackException):
+            items = None
+        # msgpack errors have no useful message, and a truncated body just ends the iteration
+        if items is None or unpacker.tell() != len(body):
+            raise ValueError("Malformed msgpack body")
+        return _log_list.validate_python(items)
+    raise HTTPException(status_code=415, detail=f"Unsupported content type: {content_type}")
+
+async def _read_body(request: Request, limit: int) -> bytes:
+    # Refuse an oversized body up front when its length is declared, else stop reading at the limit
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        raise HTTPException(status_code=413, detail=f"Body larger than {limit} bytes")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise HTTPException(status_code=413, detail=f"Body larger than {limit} bytes")
+    return bytes(body)
+
+def _is_duplicate_event(e: IntegrityError) -> bool:
+    # MySQL names the index ("Duplicate entry ... for key 'detection_logs.uq_detection_logs_trip_id_client_event_id'"),
+    # SQLite its columns ("UNIQUE constraint failed: detection_logs.trip_id, detection_logs.client_event_id")
+    message = str(e.orig)
+    return "uq_detection_logs_trip_id_client_event_id" in message or "detection_logs.client_event_id" in message
+
 @router.post("/start", response_model=schemas.TripResponse)
 async def start_trip(
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.Principal = Depends(auth.get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     # Optional: check if there's already an active trip and end it?
@@ -21,7 +98,7 @@ async def start_trip(
 
 @router.post("/end", response_model=schemas.TripResponse)
 async def end_trip(
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.Principal = Depends(auth.get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     active_trip = await crud.get_active_trip(db, user_id=current_user.user_id)
@@ -48,18 +125,62 @@ async def end_trip(
 async def create_log(
     trip_id: int,
     log: schemas.DetectionLogCreate,
-    current_user: models.User = Depends(auth.get_current_user),
+    response: Response,
+    current_user: schemas.Principal = Depends(auth.get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     # Verify trip belongs to user
     # Ideally we should fetch trip and check ownership
     # For speed, assuming client sends correct trip_id that they got from /start
-    return await crud.create_detection_log(db=db, log=log, trip_id=trip_id)
+    return await _save_log(db, log, trip_id, response)
+
+@router.post("/{trip_id}/logs/batch", response_model=schemas.DetectionLogBatchResponse)
+async def create_logs_batch(
+    trip_id: int,
+    request: Request,
+    current_user: schemas.Principal = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Upload many logs at once, e.g. events queued while the client was offline.
+    Body: a JSON array, NDJSON (application/x-ndjson) or MessagePack (application/msgpack).
+    All logs are stored in one transaction; logs whose client_event_id was already
+    stored for this trip are skipped, so a failed upload can simply be sent again.
+    """
+    trip = await db.get(models.Trip, trip_id)
+    if not trip or trip.user_id != current_user.user_id:
+        raise HTTPException(status_code=404, detail="Trip not found")
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    try:
+        logs = _parse_log_batch(content_type, await _read_body(request, LOG_BATCH_MAX_BYTES))
+    except (ValidationError, ValueError) as e:
+        detail = e.errors(include_url=False, include_input=False) if isinstance(e, ValidationError) else str(e)
+        raise HTTPException(status_code=422, detail=detail)
+    if len(logs) > LOG_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {LOG_BATCH_MAX_ITEMS} logs per batch")
+
+    # Queued events should carry their own timestamp; fall back to the upload time
+    now = datetime.now()
+    rows = [
+        {**log.model_dump(), "trip_id": trip_id, "timestamp": log.timestamp or now}
+        for log in logs
+    ]
+    try:
+        inserted = await crud.create_detection_logs(db, rows) if rows else 0
+    except IntegrityError as e:
+        await db.rollback()
+        if not _is_duplicate_event(e):
+            raise
+        # The same client_event_id committed by a concurrent upload
+        raise HTTPException(status_code=409, detail="Some events are being uploaded concurrently, retry the batch")
+    return schemas.DetectionLogBatchResponse(received=len(rows), inserted=inserted, duplicates=len(rows) - inserted)
 
 @router.post("/detections", response_model=schemas.DetectionLogResponse)
 async def create_detection_auto_trip(
     log: schemas.DetectionLogCreate,
-    current_user: models.User = Depends(auth.get_current_user),
+    response: Response,
+    current_user: schemas.Principal = Depends(auth.get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -70,4 +191,4 @@ async def create_detection_auto_trip(
     if not active_trip:
         raise HTTPException(status_code=404, detail="No active trip found to log detection")
     
-    return await crud.create_detection_log(db=db, log=log, trip_id=active_trip.trip_id)
+    return await _save_log(db, log, active_trip.trip_id, response)
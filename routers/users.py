@@ -21,7 +21,7 @@ async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_db))
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     # OAuth2PasswordRequestForm uses 'username' field, we treat it as email
     user = await crud.get_user_by_email(db, email=form_data.username) 
-    if not user or not auth.verify_password(form_data.password, user.password_hash):
+    if not user or not await auth.password_hasher.verify(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -118,7 +118,7 @@ async def reset_password(request: ResetPasswordRequest, db: AsyncSession = Depen
     # Update password Logic
     # We need a dedicated update_password function in CRUD or reuse dynamic update_user if password field allowed
     # UserUpdate schema doesn't have password. Let's add specific logic here.
-    new_hash = auth.get_password_hash(request.new_password)
+    new_hash = await auth.password_hasher.hash(request.new_password)
     
     from sqlalchemy import update
     query = (
@@ -128,17 +128,18 @@ async def reset_password(request: ResetPasswordRequest, db: AsyncSession = Depen
     )
     await db.execute(query)
     await db.commit()
+    await auth.invalidate_principal(request.email)
     
     return {"message": "Password updated successfully"}
 
 @router.get("/me", response_model=schemas.UserResponse)
-async def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
+async def read_users_me(current_user: schemas.Principal = Depends(auth.get_current_user)):
     return current_user
 
 @router.put("/me", response_model=schemas.UserResponse)
 async def update_users_me(
     user_update: schemas.UserUpdate,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.Principal = Depends(auth.get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     return await crud.update_user(db=db, user_id=current_user.user_id, user_update=user_update)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -19,6 +19,12 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class Principal(UserResponse):
+    # The authenticated user returned by auth.get_current_user: a read-only snapshot, no ORM object
+    class Config:
+        from_attributes = True
+        frozen = True
+
 class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     phone_number: Optional[str] = None
@@ -70,16 +76,24 @@ class TripResponse(TripBase):
 
 # --- Detection Log Schemas ---
 class DetectionLogBase(BaseModel):
-    event_type: str
+    # Lengths match the columns, so a row the database would reject never reaches the log buffer
+    event_type: str = Field(..., max_length=50)
     confidence: float
-    gps_location: Optional[str] = None
+    gps_location: Optional[str] = Field(None, max_length=50)
     timestamp: Optional[datetime] = None
+    # Optional idempotency key: a log with the same key in the same trip is only stored once
+    client_event_id: Optional[str] = Field(None, max_length=64)
 
 class DetectionLogCreate(DetectionLogBase):
     pass
 
+class DetectionLogBatchResponse(BaseModel):
+    received: int
+    inserted: int
+    duplicates: int
+
 class DetectionLogResponse(DetectionLogBase):
-    log_id: int
+    log_id: Optional[int] = None  # None when the log was queued (LOG_BUFFER_ENABLED) and not written yet
     trip_id: int
     timestamp: datetime
 
@@ -0,0 +1,182 @@
+"""
+Shared fixtures: the app's own engine pointed at a throw-away SQLite file, seeded once
+per session with one driver, their trips and detection logs, and the daily rollup.
+"""
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Must be set before `database` creates the engine
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="drowsiness-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import BigInteger, event
+from sqlalchemy.ext.compiler import compiles
+
+import auth
+import database
+import models
+import rollup
+import schemas
+from inference.results import Detections
+
+TRIPS = 20
+LOGS_PER_TRIP = 5
+EVENT_TYPES = ["drowsy", "yawn", "phone"]
+_driver_numbers = itertools.count(1)
+
+
+@compiles(BigInteger, "sqlite")
+def _bigint_sqlite(element, compiler, **kw):
+    # SQLite only assigns keys to INTEGER PRIMARY KEY columns; MySQL's BIGINT AUTO_INCREMENT does it itself
+    return "INTEGER"
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", help="Also run the timing-based load tests")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: asserts on wall-clock timings, skipped unless --benchmark")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="timing-based, run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+async def _seed() -> schemas.Principal:
+    async with database.engine.begin() as conn:
+        await conn.run_sync(database.Base.metadata.drop_all)
+        await conn.run_sync(database.Base.metadata.create_all)
+    now = datetime.now()
+    async with database.SessionLocal() as db:
+        user = models.User(email="driver@example.com", password_hash="x", full_name="Driver", phone_number="0123")
+        db.add(user)
+        await db.flush()
+        await db.refresh(user)
+        principal = schemas.Principal.model_validate(user)
+        for i in range(TRIPS):
+            start = now - timedelta(days=i * 3, hours=1)
+            trip = models.Trip(user_id=user.user_id, start_time=start, end_time=start + timedelta(minutes=30 + i),
+                               status=models.TripStatus.FINISHED)
+            db.add(trip)
+            await db.flush()
+            for j in range(LOGS_PER_TRIP):
+                db.add(models.DetectionLog(trip_id=trip.trip_id, timestamp=start + timedelta(minutes=j),
+                                           event_type=EVENT_TYPES[j % len(EVENT_TYPES)], confidence=0.9))
+        await db.commit()
+        await rollup.rebuild(db)
+    # The test client runs its own event loop; don't hand it connections from this one
+    await database.engine.dispose()
+    return principal
+
+
+@pytest.fixture(scope="session")
+def driver() -> schemas.Principal:
+    return asyncio.run(_seed())
+
+
+def run(call):
+    """Run call(db) with its own session and event loop, and return its result."""
+    async def main():
+        try:
+            async with database.SessionLocal() as db:
+                return await call(db)
+        finally:
+            await database.engine.dispose()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def new_driver(driver):
+    """Factory of drivers without trips, for tests that write: the seeded driver's data stays as seeded."""
+    async def create(db):
+        user = models.User(email=f"driver{next(_driver_numbers)}@example.com", password_hash="x",
+                           full_name="Driver", phone_number="0123")
+        db.add(user)
+        await db.flush()
+        await db.refresh(user)
+        principal = schemas.Principal.model_validate(user)
+        await db.commit()
+        return principal
+
+    return lambda: run(create)
+
+
+@pytest.fixture
+def queries():
+    """SQL statements (with parameters) executed while the test runs."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(database.engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(database.engine.sync_engine, "before_cursor_execute", record)
+
+
+def make_client(driver: schemas.Principal, *routers) -> TestClient:
+    """App with only these routers, authenticated as the seeded driver without a user lookup."""
+    app = FastAPI()
+    for router in routers:
+        app.include_router(router)
+    app.dependency_overrides[auth.get_current_user] = lambda: driver
+    return TestClient(app)
+
+
+class FakeExecutor:
+    """
+    Stands in for InferenceExecutor without a model: every frame gets one "drowsy" box
+    whose score is its length / 100, and b"not an image" gets None. Calls wait while
+    `gate` is cleared, to hold frames in flight.
+    """
+
+    names = {0: "awake", 1: "drowsy"}
+    imgsz = 640
+
+    def __init__(self, workers: int = 1, queue_size: int = 4):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batches = []
+        self.gate = None
+        self.closed = False
+
+    @property
+    def load(self) -> float:
+        return 0.0
+
+    @staticmethod
+    def detections(frame: bytes):
+        if frame == b"not an image":
+            return None
+        return Detections(boxes=np.array([[1, 2, 3, 4]], np.float32), scores=np.array([len(frame) / 100], np.float32),
+                          class_ids=np.array([1], np.int64))
+
+    async def decode_and_detect_batch(self, frames):
+        self.batches.append(list(frames))
+        if self.gate is not None:
+            await self.gate.wait()
+        return [self.detections(frame) for frame in frames]
+
+    async def decode_and_detect(self, data: bytes):
+        return (await self.decode_and_detect_batch([data]))[0]
+
+    def shutdown(self):
+        self.closed = True
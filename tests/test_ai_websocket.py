@@ -0,0 +1,56 @@
+"""/ai/ws/detect with a fake model: frame modes, binary subprotocols and what happens to text messages."""
+import msgpack
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from conftest import FakeExecutor
+from inference import results
+from inference.batching import BatchScheduler
+from routers import ai_detection
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeExecutor()
+    monkeypatch.setattr(ai_detection, "executor", fake)
+    monkeypatch.setattr(ai_detection, "scheduler", BatchScheduler(fake))
+    monkeypatch.setattr(ai_detection, "status_levels", results.status_levels(fake.names))
+    monkeypatch.setattr(ai_detection, "model_state", "ready")
+    app = FastAPI()
+    app.include_router(ai_detection.router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("mode", ["all", "latest"])
+def test_frames_get_results(client, mode):
+    with client.websocket_connect(f"/ai/ws/detect?mode={mode}") as ws:
+        ws.send_bytes(b"frame-1")
+        response = ws.receive_json()
+        assert response["raw_status"] == "drowsy"
+        assert response["detections"][0]["label"] == "drowsy"
+        assert ("dropped_frames" in response) == (mode == "latest")
+        ws.send_bytes(b"not an image")
+        assert ws.receive_json() == {"error": "Invalid frame"}
+
+
+@pytest.mark.parametrize("mode", ["all", "latest"])
+def test_text_message_closes_with_1003(client, mode):
+    with client.websocket_connect(f"/ai/ws/detect?mode={mode}") as ws:
+        ws.send_text("not a frame")
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+        assert closed.value.code == 1003
+
+
+def test_binary_subprotocol(client):
+    with client.websocket_connect("/ai/ws/detect", subprotocols=["drowsiness.msgpack.v1"]) as ws:
+        assert ws.accepted_subprotocol == "drowsiness.msgpack.v1"
+        assert ws.receive_json() == {"protocol": "drowsiness.msgpack.v1", "names": {"0": "awake", "1": "drowsy"}}
+        ws.send_bytes(b"frame-1")
+        response = msgpack.unpackb(ws.receive_bytes())
+        assert (response["r"], response["c"], response["f"], response["b"]) == (1, [1], [7], [1, 2, 3, 4])
+        # Errors stay JSON text
+        ws.send_bytes(b"not an image")
+        assert ws.receive_json() == {"error": "Invalid frame"}
@@ -0,0 +1,73 @@
+"""The principal cache in get_current_user: hits, expiry, invalidation on profile changes."""
+import pytest
+from fastapi import HTTPException
+
+import auth
+import crud
+import schemas
+from cache import MemoryCache
+from conftest import run
+
+
+@pytest.fixture(autouse=True)
+def principal_cache(monkeypatch):
+    cache = MemoryCache()
+    monkeypatch.setattr(auth, "principal_cache", cache)
+    return cache
+
+
+def _user_lookups(queries):
+    return sum("WHERE users.email = " in statement for statement, _ in queries)
+
+
+def _lookup(email):
+    token = auth.create_access_token({"sub": email})
+    return run(lambda db: auth.get_user_from_token(token, db))
+
+
+def test_repeated_requests_reuse_the_principal(new_driver, queries):
+    user = new_driver()
+    assert _lookup(user.email) == user
+    assert _lookup(user.email) == user
+    assert _user_lookups(queries) == 1
+
+
+def test_expired_entries_are_looked_up_again(new_driver, queries, principal_cache):
+    user = new_driver()
+    _lookup(user.email)
+    principal, _ = principal_cache._entries[user.email]
+    # As if AUTH_CACHE_TTL_S had passed
+    principal_cache._entries[user.email] = (principal, 0)
+    _lookup(user.email)
+    assert _user_lookups(queries) == 2
+
+
+def test_profile_updates_invalidate_the_principal(new_driver):
+    user = new_driver()
+    _lookup(user.email)
+    run(lambda db: crud.update_user(db, user.user_id, schemas.UserUpdate(full_name="Renamed")))
+    assert _lookup(user.email).full_name == "Renamed"
+
+
+def test_invalidate_principal(new_driver, queries):
+    user = new_driver()
+    _lookup(user.email)
+    run(lambda db: auth.invalidate_principal(user.email))
+    _lookup(user.email)
+    assert _user_lookups(queries) == 2
+
+
+def test_ttl_zero_disables_the_cache(new_driver, queries, monkeypatch, principal_cache):
+    monkeypatch.setattr(auth, "AUTH_CACHE_TTL_S", 0)
+    user = new_driver()
+    _lookup(user.email)
+    _lookup(user.email)
+    assert _user_lookups(queries) == 2
+    assert not principal_cache._entries
+
+
+def test_unknown_users_are_rejected_and_not_cached(principal_cache):
+    with pytest.raises(HTTPException) as rejected:
+        _lookup("nobody@example.com")
+    assert rejected.value.status_code == 401
+    assert not principal_cache._entries
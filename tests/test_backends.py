@@ -0,0 +1,69 @@
+"""The NumPy NMS and postprocessing of the exported backends, against torch / ultralytics."""
+import numpy as np
+import pytest
+import torch
+import torchvision
+from ultralytics.utils import ops
+from ultralytics.utils.nms import non_max_suppression
+
+from inference.backends import CONF_THRESHOLD, IOU_THRESHOLD, MAX_DETECTIONS, load_backend, nms, postprocess
+from inference.preprocess import letterbox_params
+
+
+def _random_boxes(rng, n):
+    xy = rng.uniform(0, 500, (n, 2))
+    wh = rng.uniform(5, 150, (n, 2))
+    return np.concatenate([xy, xy + wh], axis=1).astype(np.float32)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_nms_matches_torchvision(seed):
+    rng = np.random.default_rng(seed)
+    boxes = _random_boxes(rng, 200)
+    scores = rng.uniform(0, 1, 200).astype(np.float32)
+    expected = torchvision.ops.nms(torch.from_numpy(boxes), torch.from_numpy(scores), IOU_THRESHOLD).numpy()
+    np.testing.assert_array_equal(nms(boxes, scores, IOU_THRESHOLD), expected)
+
+
+def test_nms_keeps_anchor_order_on_equal_scores():
+    boxes = np.array([[0, 0, 10, 10], [0, 0, 10, 10.5], [100, 100, 110, 110], [0, 0, 10, 11]], np.float32)
+    scores = np.full(4, 0.5, np.float32)
+    expected = torchvision.ops.nms(torch.from_numpy(boxes), torch.from_numpy(scores), IOU_THRESHOLD).numpy()
+    np.testing.assert_array_equal(nms(boxes, scores, IOU_THRESHOLD), expected)
+    assert nms(boxes, scores, IOU_THRESHOLD).tolist() == [0, 2]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("shape", [(480, 640, 3), (720, 1280, 3), (640, 360, 3)])
+@pytest.mark.parametrize("auto", [False, True])
+def test_postprocess_matches_ultralytics(seed, shape, auto):
+    rng = np.random.default_rng(seed)
+    ratio, _, pad, (out_w, out_h) = letterbox_params(shape, 640, auto)
+    num_classes, anchors = 2, 2000
+    output = np.empty((4 + num_classes, anchors), np.float32)
+    output[0] = rng.uniform(0, out_w, anchors)
+    output[1] = rng.uniform(0, out_h, anchors)
+    output[2:4] = rng.uniform(4, 200, (2, anchors))
+    output[4:] = rng.uniform(0, 0.4, (num_classes, anchors)) ** 2 * 6
+
+    det = postprocess(output.copy(), ratio, pad, shape)
+
+    pred = non_max_suppression(torch.from_numpy(output[None]), CONF_THRESHOLD, IOU_THRESHOLD, max_det=MAX_DETECTIONS)[0]
+    pred[:, :4] = ops.scale_boxes((out_h, out_w), pred[:, :4], shape)
+    expected = pred.numpy()
+    assert len(det.scores) == len(expected) > 0
+    np.testing.assert_allclose(det.boxes, expected[:, :4], atol=1e-3)
+    np.testing.assert_allclose(det.scores, expected[:, 4], atol=1e-6)
+    np.testing.assert_array_equal(det.class_ids, expected[:, 5].astype(np.int64))
+
+
+def test_postprocess_without_detections():
+    output = np.zeros((6, 100), np.float32)
+    det = postprocess(output, 1.0, (0, 0), (640, 640, 3))
+    assert det.boxes.shape == (0, 4)
+    assert len(det.scores) == len(det.class_ids) == 0
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown inference backend"):
+        load_backend("tensorrt")
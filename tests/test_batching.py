@@ -0,0 +1,87 @@
+"""BatchScheduler: frames from separate callers share a forward pass, each gets its own result."""
+import asyncio
+
+import pytest
+
+from conftest import FakeExecutor
+from inference.batching import BatchScheduler
+from inference.executor import InferenceQueueFull
+
+
+def test_concurrent_frames_form_one_batch():
+    executor = FakeExecutor()
+    scheduler = BatchScheduler(executor, max_batch=8, max_wait_ms=50)
+    frames = [b"a", b"not an image", b"ccc"]
+
+    async def main():
+        try:
+            results = await asyncio.gather(*(scheduler.submit(frame) for frame in frames))
+        finally:
+            await scheduler.stop()
+        assert executor.batches == [frames]
+        assert results[1] is None
+        assert [det.scores[0] for det in (results[0], results[2])] == pytest.approx([0.01, 0.03])
+
+    asyncio.run(main())
+
+
+def test_batches_are_capped_at_max_batch():
+    executor = FakeExecutor()
+    scheduler = BatchScheduler(executor, max_batch=2, max_wait_ms=50)
+
+    async def main():
+        try:
+            await asyncio.gather(*(scheduler.submit(b"x" * n) for n in range(1, 6)))
+        finally:
+            await scheduler.stop()
+        assert [len(batch) for batch in executor.batches] == [2, 2, 1]
+
+    asyncio.run(main())
+
+
+def test_a_lone_frame_waits_at_most_max_wait():
+    executor = FakeExecutor()
+    scheduler = BatchScheduler(executor, max_batch=8, max_wait_ms=1)
+
+    async def main():
+        try:
+            async with asyncio.timeout(1):
+                assert (await scheduler.submit(b"frame")) is not None
+        finally:
+            await scheduler.stop()
+        assert executor.batches == [[b"frame"]]
+
+    asyncio.run(main())
+
+
+def test_rejects_frames_beyond_the_scheduler_queue():
+    executor = FakeExecutor(workers=1, queue_size=0)
+    scheduler = BatchScheduler(executor, max_batch=2, max_wait_ms=0)
+
+    async def main():
+        try:
+            # All three are queued in the same loop step, before the collector can take any
+            results = await asyncio.gather(*(scheduler.submit(b"x" * n) for n in range(1, 4)), return_exceptions=True)
+        finally:
+            await scheduler.stop()
+        assert [isinstance(result, InferenceQueueFull) for result in results] == [False, False, True]
+        assert executor.batches == [[b"x", b"xx"]]
+
+    asyncio.run(main())
+
+
+def test_executor_errors_reach_every_caller_in_the_batch():
+    class FailingExecutor(FakeExecutor):
+        async def decode_and_detect_batch(self, frames):
+            raise InferenceQueueFull("busy")
+
+    scheduler = BatchScheduler(FailingExecutor(), max_batch=4, max_wait_ms=20)
+
+    async def main():
+        try:
+            results = await asyncio.gather(scheduler.submit(b"a"), scheduler.submit(b"b"), return_exceptions=True)
+        finally:
+            await scheduler.stop()
+        assert all(isinstance(result, InferenceQueueFull) for result in results)
+
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""The daily_stats migration fills the rollup from the trips and logs already in the database."""
+import asyncio
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import rollup
+from conftest import ROOT
+
+BEFORE = "8b2e6c4f1a57"
+
+
+@pytest.fixture
+def upgrade(tmp_path):
+    path = tmp_path / "migrated.db"
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    config.set_main_option("sqlalchemy.url", f"sqlite+aiosqlite:///{path}")
+    command.upgrade(config, BEFORE)
+    return path, lambda: command.upgrade(config, "head")
+
+
+def _seed(path):
+    db = sqlite3.connect(path)
+    db.execute("INSERT INTO users (email, password_hash, full_name, phone_number) VALUES ('a@example.com', 'x', 'A', '1')")
+    start = datetime(2026, 10, 1, 23, 40)
+    log_id = 0
+    # Two trips starting on 1 October (one still active), one on 2 October
+    for start_time, minutes, events in ((start, 35, ["drowsy", "yawn", "drowsy"]), (start + timedelta(minutes=5), None, ["phone"]),
+                                        (start + timedelta(hours=10), 90.5, [])):
+        end_time = None if minutes is None else start_time + timedelta(minutes=minutes)
+        trip_id = db.execute("INSERT INTO trips (user_id, start_time, end_time, status) VALUES (1, ?, ?, 'FINISHED')",
+                             (str(start_time), end_time and str(end_time))).lastrowid
+        for event_type in events:
+            log_id += 1
+            db.execute("INSERT INTO detection_logs (log_id, trip_id, timestamp, event_type, confidence) VALUES (?, ?, ?, ?, 0.9)",
+                       (log_id, trip_id, str(start_time), event_type))
+    db.commit()
+    db.close()
+
+
+def _rows(path):
+    db = sqlite3.connect(path)
+    try:
+        return db.execute("SELECT day, event_type, detection_count, trip_count, driving_minutes FROM daily_stats ORDER BY day, event_type").fetchall()
+    finally:
+        db.close()
+
+
+def _check(path):
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        try:
+            async with AsyncSession(engine) as db:
+                return await rollup.check(db)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def test_upgrade_backfills_existing_trips(upgrade):
+    path, upgrade_to_head = upgrade
+    _seed(path)
+    upgrade_to_head()
+    assert _rows(path) == [
+        ("2026-10-01", "", 0, 2, 35),
+        ("2026-10-01", "drowsy", 2, 0, 0),
+        ("2026-10-01", "phone", 1, 0, 0),
+        ("2026-10-01", "yawn", 1, 0, 0),
+        ("2026-10-02", "", 0, 1, 90),
+    ]
+    assert _check(path) == []
+
+
+def test_upgrade_recomputes_a_table_created_at_startup(upgrade):
+    path, upgrade_to_head = upgrade
+    _seed(path)
+    # The app created daily_stats before the migration ran and counted one new trip into it
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE daily_stats (user_id INTEGER, day DATE, event_type VARCHAR(50), detection_count INTEGER, "
+               "trip_count INTEGER, driving_minutes INTEGER, PRIMARY KEY (user_id, day, event_type))")
+    db.execute("INSERT INTO daily_stats VALUES (1, '2026-10-02', '', 0, 1, 90)")
+    db.commit()
+    db.close()
+    upgrade_to_head()
+    assert _check(path) == []
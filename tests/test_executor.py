@@ -0,0 +1,100 @@
+"""InferenceExecutor: bounded queue, and slots held until the worker is done."""
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import FakeExecutor
+from inference import executor as executor_module
+from inference.executor import InferenceExecutor, InferenceQueueFull
+
+
+class BlockingBackend:
+    """Model stand-in whose predict() waits for `release`, so frames stay in flight."""
+
+    names = FakeExecutor.names
+    imgsz = 640
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def predict(self, images):
+        self.release.wait(timeout=10)
+        return [FakeExecutor.detections(b"frame") for _ in images]
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = BlockingBackend()
+    monkeypatch.setattr(executor_module, "load_backend", lambda name: backend)
+    return backend
+
+
+def _image():
+    return np.zeros((48, 64, 3), np.uint8)
+
+
+def test_rejects_frames_beyond_workers_plus_queue(backend):
+    pool = InferenceExecutor(workers=1, queue_size=2)
+
+    async def main():
+        running = [asyncio.create_task(pool.detect(_image())) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert pool.pending == 3
+        assert pool.load == 1.0
+        with pytest.raises(InferenceQueueFull):
+            await pool.detect(_image())
+        backend.release.set()
+        results = await asyncio.gather(*running)
+        assert all(det.class_ids.tolist() == [1] for det in results)
+        assert pool.pending == 0
+        # Room again once the queue drained
+        await pool.detect(_image())
+
+    try:
+        asyncio.run(main())
+    finally:
+        backend.release.set()
+        pool.shutdown()
+
+
+def test_cancelled_caller_keeps_its_slot_until_the_worker_is_done(backend):
+    pool = InferenceExecutor(workers=1, queue_size=0)
+
+    async def main():
+        task = asyncio.create_task(pool.detect(_image()))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        # The model is still busy with the abandoned frame
+        assert pool.pending == 1
+        with pytest.raises(InferenceQueueFull):
+            await pool.detect(_image())
+        backend.release.set()
+        while pool.pending:
+            await asyncio.sleep(0.01)
+
+    try:
+        asyncio.run(main())
+    finally:
+        backend.release.set()
+        pool.shutdown()
+
+
+def test_decode_and_detect_rescales_and_skips_invalid_frames(backend):
+    import cv2
+
+    backend.release.set()
+    pool = InferenceExecutor(workers=1, queue_size=0)
+    frame = cv2.imencode(".png", np.zeros((48, 64, 3), np.uint8))[1].tobytes()
+
+    async def main():
+        assert await pool.decode_and_detect(b"not an image") is None
+        results = await pool.decode_and_detect_batch([frame, b"not an image", frame])
+        assert [det is None for det in results] == [False, True, False]
+
+    try:
+        asyncio.run(main())
+    finally:
+        pool.shutdown()
@@ -0,0 +1,95 @@
+"""POST /trips/{trip_id}/logs/batch: idempotency keys, body formats and limits."""
+import msgpack
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import crud
+from conftest import make_client, run
+from routers import trips
+
+
+@pytest.fixture
+def upload(new_driver):
+    """post(logs, ...) to the batch endpoint of a new trip, and the trip's stored logs."""
+    driver = new_driver()
+    trip_id = run(lambda db: crud.create_trip(db, driver.user_id)).trip_id
+    client = make_client(driver, trips.router)
+
+    def post(logs=None, **kwargs):
+        return client.post(f"/trips/{trip_id}/logs/batch", json=logs, **kwargs)
+
+    post.logs = lambda: run(lambda db: crud.get_trip_logs(db, trip_id))
+    return post
+
+
+def _log(key=None, event_type="drowsy"):
+    return {"event_type": event_type, "confidence": 0.9, "client_event_id": key}
+
+
+def test_replayed_batch_is_stored_once(upload):
+    batch = [_log("a"), _log("b"), _log(None)]
+    assert upload(batch).json() == {"received": 3, "inserted": 3, "duplicates": 0}
+    # The retry after a lost response: keyed events are skipped, unkeyed ones can't be told apart
+    assert upload(batch).json() == {"received": 3, "inserted": 1, "duplicates": 2}
+    assert sorted(log.client_event_id or "" for log in upload.logs()) == ["", "", "a", "b"]
+
+
+def test_duplicates_within_a_batch(upload):
+    batch = [_log("a", "drowsy"), _log("a", "yawn"), _log("b"), _log("b")]
+    assert upload(batch).json() == {"received": 4, "inserted": 2, "duplicates": 2}
+    # The first occurrence wins
+    logs = {log.client_event_id: log.event_type for log in upload.logs()}
+    assert logs == {"a": "drowsy", "b": "drowsy"}
+
+
+def test_msgpack_and_ndjson_bodies(upload):
+    body = msgpack.packb([_log("a")]) + msgpack.packb(_log("b"))
+    response = upload(content=body, headers={"content-type": "application/msgpack"})
+    assert response.json()["inserted"] == 2
+    body = b'{"event_type": "yawn", "confidence": 0.5, "client_event_id": "c"}\n\n'
+    response = upload(content=body, headers={"content-type": "application/x-ndjson"})
+    assert response.json()["inserted"] == 1
+
+
+@pytest.mark.parametrize("body", [b"\xc1", msgpack.packb([_log("a")])[:-3]], ids=["invalid", "truncated"])
+def test_malformed_msgpack(upload, body):
+    response = upload(content=body, headers={"content-type": "application/msgpack"})
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Malformed msgpack body"
+    assert upload.logs() == []
+
+
+def test_body_size_is_checked_before_reading(upload, monkeypatch):
+    monkeypatch.setattr(trips, "LOG_BATCH_MAX_BYTES", 100)
+    assert upload([_log("a")]).status_code == 200
+    assert upload([_log(str(i)) for i in range(10)]).status_code == 413
+
+    def chunks():
+        yield b"["
+        for i in range(10):
+            yield b'{"event_type": "drowsy", "confidence": 0.9},'
+        yield b"{}]"
+
+    # Without a Content-Length, reading stops at the limit
+    assert upload(content=chunks()).status_code == 413
+
+
+def test_concurrent_duplicate_is_a_conflict(upload, monkeypatch):
+    upload([_log("a")])
+
+    async def nothing_stored(db, rows):
+        return set()
+
+    # As if another upload committed "a" between the duplicate check and the insert
+    monkeypatch.setattr(crud, "_existing_client_event_ids", nothing_stored)
+    response = upload([_log("a")])
+    assert response.status_code == 409
+
+
+def test_other_integrity_errors_are_not_conflicts(upload, monkeypatch):
+    async def rejected(db, rows):
+        raise IntegrityError("INSERT INTO detection_logs ...", {}, Exception("FOREIGN KEY constraint failed"))
+
+    monkeypatch.setattr(crud, "create_detection_logs", rejected)
+    with pytest.raises(IntegrityError):
+        upload([_log("a")])
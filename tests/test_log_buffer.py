@@ -0,0 +1,86 @@
+"""The write-behind log buffer keeps every queued log through flushes, failures and shutdown."""
+import asyncio
+
+import crud
+import database
+import schemas
+from conftest import run
+from log_buffer import DetectionLogBuffer
+
+
+def _log(i: int) -> schemas.DetectionLogCreate:
+    return schemas.DetectionLogCreate(event_type="drowsy", confidence=0.9, client_event_id=f"event-{i}")
+
+
+def _trip(new_driver) -> int:
+    driver = new_driver()
+    return run(lambda db: crud.create_trip(db, driver.user_id)).trip_id
+
+
+def test_stop_during_a_slow_flush_loses_nothing(new_driver, monkeypatch):
+    trip_id = _trip(new_driver)
+    write = crud.create_detection_logs
+
+    async def main():
+        writing = asyncio.Event()
+
+        async def slow_write(db, rows):
+            writing.set()
+            await asyncio.sleep(0.2)
+            return await write(db, rows)
+
+        monkeypatch.setattr(crud, "create_detection_logs", slow_write)
+        buffer = DetectionLogBuffer(max_rows=5, max_delay_ms=10)
+        buffer.start()
+        for i in range(5):
+            await buffer.add(trip_id, _log(i))
+        # The background flush has taken these 5 rows off the queue and is still writing them
+        await writing.wait()
+        for i in range(5, 8):
+            await buffer.add(trip_id, _log(i))
+        await buffer.stop()
+        await database.engine.dispose()
+
+    asyncio.run(main())
+    logs = run(lambda db: crud.get_trip_logs(db, trip_id))
+    assert sorted(log.client_event_id for log in logs) == [f"event-{i}" for i in range(8)]
+
+
+def test_rejected_row_is_dropped_alone(new_driver):
+    trip_id = _trip(new_driver)
+
+    async def main():
+        buffer = DetectionLogBuffer()
+        await buffer.add(trip_id, _log(0))
+        # Unknown trips are skipped by the insert, a NULL confidence is refused by the database
+        bad = await buffer.add(trip_id, _log(1))
+        bad["confidence"] = None
+        await buffer.add(trip_id, _log(2))
+        written = await buffer.flush()
+        await database.engine.dispose()
+        return written, buffer.pending
+
+    assert asyncio.run(main()) == (2, 0)
+    logs = run(lambda db: crud.get_trip_logs(db, trip_id))
+    assert sorted(log.client_event_id for log in logs) == ["event-0", "event-2"]
+
+
+def test_unreachable_database_keeps_rows_queued(new_driver, monkeypatch):
+    trip_id = _trip(new_driver)
+    write = crud.create_detection_logs
+
+    async def main():
+        async def down(db, rows):
+            raise ConnectionRefusedError("database is down")
+
+        buffer = DetectionLogBuffer()
+        for i in range(3):
+            await buffer.add(trip_id, _log(i))
+        monkeypatch.setattr(crud, "create_detection_logs", down)
+        assert await buffer.flush() == 0
+        assert buffer.pending == 3
+        monkeypatch.setattr(crud, "create_detection_logs", write)
+        assert await buffer.flush() == 3
+        await database.engine.dispose()
+
+    asyncio.run(main())
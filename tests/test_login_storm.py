@@ -0,0 +1,195 @@
+"""
+A burst of logins must not stall unrelated requests.
+
+bcrypt runs on auth.password_hasher's thread pool, so while many logins are being
+checked, other endpoints keep answering in milliseconds instead of waiting behind
+each ~100-300 ms hash. The default tests hold bcrypt at a gate and check where it
+runs and how the pool queues; the timed load test only runs with --benchmark.
+Run it directly for a bigger storm and the full numbers:
+
+    python tests/test_login_storm.py --logins 18 --workers 2
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import conftest  # sys.path and the test database, also when run as a script
+import auth
+import crud
+import database
+import schemas
+from routers import contacts, users
+
+EMAIL = "storm@example.com"
+PASSWORD = "correct horse battery staple"
+
+
+async def _storm_app(driver: schemas.Principal) -> FastAPI:
+    async with database.SessionLocal() as db:
+        if await crud.get_user_by_email(db, EMAIL) is None:
+            await crud.create_user(db, schemas.UserCreate(email=EMAIL, full_name="Storm", phone_number="0123", password=PASSWORD))
+
+    app = FastAPI()
+    app.include_router(users.router)
+    app.include_router(contacts.router)
+    app.dependency_overrides[auth.get_current_user] = lambda: driver
+    return app
+
+
+async def login_storm(driver: schemas.Principal, logins: int) -> dict:
+    """Send `logins` concurrent logins while probing GET /contacts/. Returns latencies in ms."""
+    app = await _storm_app(driver)
+    probes = []
+    storm_done = asyncio.Event()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        async def probe():
+            while not storm_done.is_set():
+                start = time.perf_counter()
+                response = await client.get("/contacts/")
+                probes.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200
+                await asyncio.sleep(0.005)
+
+        async def login():
+            return await client.post("/users/token", data={"username": EMAIL, "password": PASSWORD})
+
+        prober = asyncio.create_task(probe())
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(login() for _ in range(logins)))
+        storm_ms = (time.perf_counter() - start) * 1000
+        storm_done.set()
+        await prober
+    await database.engine.dispose()
+
+    probes.sort()
+    return {
+        "statuses": sorted({response.status_code for response in responses}),
+        "storm_ms": storm_ms,
+        "probes": len(probes),
+        "p50_ms": probes[len(probes) // 2],
+        "p99_ms": probes[min(len(probes) - 1, int(len(probes) * 0.99))],
+        "max_ms": probes[-1],
+    }
+
+
+def _bcrypt_ms() -> float:
+    hashed = auth.get_password_hash(PASSWORD)
+    start = time.perf_counter()
+    auth.verify_password(PASSWORD, hashed)
+    return (time.perf_counter() - start) * 1000
+
+
+class GatedBcrypt:
+    """Stands in for auth.verify_password: waits for `release` and records where and how many ran at once."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.threads = set()
+        self._lock = threading.Lock()
+        self._running = 0
+        self.max_running = 0
+
+    def __call__(self, plain_password: str, hashed_password: str) -> bool:
+        with self._lock:
+            self.threads.add(threading.current_thread().name)
+            self._running += 1
+            self.max_running = max(self.max_running, self._running)
+        try:
+            self.release.wait(timeout=10)
+            return plain_password == PASSWORD
+        finally:
+            with self._lock:
+                self._running -= 1
+
+
+@pytest.fixture
+def bcrypt(monkeypatch):
+    gated = GatedBcrypt()
+    monkeypatch.setattr(auth, "verify_password", gated)
+    yield gated
+    gated.release.set()
+
+
+async def _wait_for(condition):
+    async with asyncio.timeout(5):
+        while not condition():
+            await asyncio.sleep(0.005)
+
+
+def test_bcrypt_runs_on_the_pool_and_the_loop_keeps_serving(driver, bcrypt, monkeypatch):
+    hasher = auth.PasswordHasher(workers=2, queue_size=10)
+    monkeypatch.setattr(auth, "password_hasher", hasher)
+
+    async def main():
+        app = await _storm_app(driver)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            logins = [asyncio.create_task(client.post("/users/token", data={"username": EMAIL, "password": PASSWORD}))
+                      for _ in range(6)]
+            await _wait_for(lambda: hasher.stats()["queued"] == 4)
+            # Every bcrypt thread is busy and logins are queued: other requests still get through
+            assert hasher.stats()["running"] == 2
+            for _ in range(5):
+                assert (await client.get("/contacts/")).status_code == 200
+            bcrypt.release.set()
+            responses = await asyncio.gather(*logins)
+        await database.engine.dispose()
+        return responses
+
+    responses = asyncio.run(main())
+    assert {response.status_code for response in responses} == {200}
+    assert bcrypt.max_running == 2
+    assert all(name.startswith("bcrypt") for name in bcrypt.threads)
+    stats = hasher.stats()
+    assert (stats["completed"], stats["rejected"], stats["running"], stats["queued"]) == (6, 0, 0, 0)
+
+
+def test_logins_beyond_the_queue_are_rejected(driver, bcrypt, monkeypatch):
+    hasher = auth.PasswordHasher(workers=1, queue_size=2)
+    monkeypatch.setattr(auth, "password_hasher", hasher)
+
+    async def main():
+        app = await _storm_app(driver)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            logins = [asyncio.create_task(client.post("/users/token", data={"username": EMAIL, "password": PASSWORD}))
+                      for _ in range(5)]
+            await _wait_for(lambda: hasher.stats()["rejected"] == 2)
+            bcrypt.release.set()
+            responses = await asyncio.gather(*logins)
+        await database.engine.dispose()
+        return responses
+
+    responses = asyncio.run(main())
+    assert sorted(response.status_code for response in responses) == [200, 200, 200, 503, 503]
+    assert all(response.headers["Retry-After"] == "1" for response in responses if response.status_code == 503)
+    assert hasher.stats()["completed"] == 3
+
+
+@pytest.mark.benchmark
+def test_login_storm_does_not_stall_other_requests(driver):
+    # Timing-based: compares probe latency with a real bcrypt check on this machine
+    # Stay within the connection pool: each login holds its session while bcrypt runs
+    result = asyncio.run(login_storm(driver, logins=12))
+    assert result["statuses"] == [200]
+    # Probes kept running during the storm instead of queueing behind it
+    assert result["probes"] >= 20
+    # On the event loop, every probe would wait for at least one whole bcrypt check
+    assert result["p99_ms"] < _bcrypt_ms() / 2, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=18)
+    parser.add_argument("--workers", type=int, default=auth.PASSWORD_HASH_WORKERS, help="bcrypt threads")
+    args = parser.parse_args()
+    auth.password_hasher = auth.PasswordHasher(workers=args.workers)
+
+    result = asyncio.run(login_storm(asyncio.run(conftest._seed()), args.logins))
+    print(f"bcrypt check: {_bcrypt_ms():.0f} ms")
+    print(f"{args.logins} logins in {result['storm_ms']:.0f} ms, statuses {result['statuses']}")
+    print(f"GET /contacts/ during the storm: {result['probes']} requests, "
+          f"p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, max {result['max_ms']:.1f} ms")
@@ -0,0 +1,83 @@
+"""Frame decoding at reduced size and letterboxing into reused buffers."""
+import cv2
+import numpy as np
+import pytest
+from ultralytics.data.augment import LetterBox
+
+from inference.preprocess import Preprocessor, check_imgsz, decode_image, image_size, letterbox_params
+
+
+def _frame(height, width, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), np.uint8)
+
+
+def _encode(img, ext):
+    return cv2.imencode(ext, img)[1].tobytes()
+
+
+@pytest.mark.parametrize("ext", [".jpg", ".png"])
+def test_image_size_reads_the_header(ext):
+    assert image_size(_encode(_frame(90, 160), ext)) == (160, 90)
+
+
+def test_image_size_of_unknown_bytes():
+    assert image_size(b"not an image") is None
+    assert image_size(b"\xff\xd8\x00truncated") is None
+
+
+def test_large_jpegs_are_decoded_at_reduced_size():
+    data = _encode(_frame(1440, 2560), ".jpg")
+    img, scale = decode_image(data, 640)
+    # 2560 / 4 is the smallest decode that still covers the model input
+    assert scale == 4.0
+    assert img.shape == (360, 640, 3)
+
+
+def test_small_and_png_frames_are_decoded_at_full_size():
+    img, scale = decode_image(_encode(_frame(480, 640), ".jpg"), 640)
+    assert (img.shape, scale) == ((480, 640, 3), 1.0)
+    img, scale = decode_image(_encode(_frame(1440, 2560), ".png"), 640)
+    assert (img.shape, scale) == ((1440, 2560, 3), 1.0)
+
+
+def test_invalid_frames():
+    assert decode_image(b"not an image") == (None, 1.0)
+
+
+def test_imgsz_must_be_a_stride_multiple():
+    assert check_imgsz(320) == 320
+    with pytest.raises(ValueError):
+        check_imgsz(300)
+    with pytest.raises(ValueError):
+        Preprocessor(0)
+
+
+@pytest.mark.parametrize("shape", [(480, 640), (720, 1280), (640, 360), (123, 457), (640, 640)])
+@pytest.mark.parametrize("auto", [False, True])
+def test_matches_ultralytics_letterbox(shape, auto):
+    img = _frame(*shape)
+    expected = LetterBox((640, 640), auto=auto, stride=32)(image=img)
+    ratio, _, (left, top), (out_w, out_h) = letterbox_params(img.shape, 640, auto)
+    assert (out_h, out_w) == expected.shape[:2]
+
+    batch, ratios, pads = Preprocessor(640, auto=auto)([img])
+    assert batch.shape == (1, 3, out_h, out_w)
+    assert (ratios, pads) == ([ratio], [(left, top)])
+    rgb = np.ascontiguousarray(expected[..., ::-1].transpose(2, 0, 1)) / 255.0
+    np.testing.assert_allclose(batch[0], rgb, atol=1e-6)
+
+
+def test_reused_buffers_repaint_the_padding():
+    preprocess = Preprocessor(640)
+    preprocess([_frame(640, 400, seed=1)])
+    batch, _, _ = preprocess([_frame(400, 640, seed=2)])
+    expected = LetterBox((640, 640))(image=_frame(400, 640, seed=2))
+    np.testing.assert_allclose(batch[0], expected[..., ::-1].transpose(2, 0, 1) / 255.0, atol=1e-6)
+
+
+def test_mixed_shapes_fall_back_to_a_square():
+    batch, _, pads = Preprocessor(640, auto=True)([_frame(480, 640), _frame(360, 640)])
+    assert batch.shape == (2, 3, 640, 640)
+    assert pads == [(0, 80), (0, 140)]
+    batch, _, _ = Preprocessor(640, auto=True)([_frame(480, 640), _frame(480, 640, seed=1)])
+    assert batch.shape == (2, 3, 480, 640)
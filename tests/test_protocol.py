@@ -0,0 +1,51 @@
+"""Binary response encoders and subprotocol negotiation for /ai/ws/detect."""
+import struct
+import sys
+
+import msgpack
+import numpy as np
+
+from inference import protocol
+from inference.results import Detections
+
+DET = Detections(
+    boxes=np.array([[10.7, 20.2, 300.9, 400.0], [-5, 0, 70000, 12]], np.float32),
+    scores=np.array([0.876, 1.2], np.float32),
+    class_ids=np.array([2, 6], np.int64),
+)
+RECOMMENDED = {"interval_ms": 200, "resolution": 480}
+
+
+def test_struct_layout():
+    data = protocol.encode_struct(DET, 2, 6, 0.333, RECOMMENDED, 3)
+    assert len(data) == 12 + 2 * 10
+    assert struct.unpack_from("<BBBBHHHH", data) == (1, 2, 6, 33, 200, 480, 3, 2)
+    records = [struct.unpack_from("<BBHHHH", data, 12 + 10 * i) for i in range(2)]
+    # Boxes truncate like the JSON response and clamp to u16, confidences clamp to 100
+    assert records == [(2, 88, 10, 20, 300, 400), (6, 100, 0, 0, 65535, 12)]
+
+
+def test_struct_saturates_dropped_frames_and_handles_no_detections():
+    empty = Detections(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64))
+    data = protocol.encode_struct(empty, 0, 0, 0.0, RECOMMENDED, 100000)
+    assert struct.unpack("<BBBBHHHH", data) == (1, 0, 0, 0, 200, 480, 65535, 0)
+
+
+def test_msgpack_fields():
+    message = msgpack.unpackb(protocol.encode_msgpack(DET, 2, 6, 0.333, RECOMMENDED, 3))
+    assert message == {
+        "v": 1, "s": 2, "r": 6, "p": 33, "i": 200, "z": 480, "d": 3,
+        "c": [2, 6], "f": [88, 100], "b": [10, 20, 300, 400, 0, 0, 65535, 12],
+    }
+
+
+def test_negotiate_picks_the_first_supported_offer():
+    assert protocol.negotiate([]) == protocol.JSON
+    assert protocol.negotiate(["graphql-ws"]) == protocol.JSON
+    assert protocol.negotiate(["graphql-ws", protocol.MSGPACK_SUBPROTOCOL, protocol.STRUCT_SUBPROTOCOL]) == protocol.MSGPACK_SUBPROTOCOL
+
+
+def test_msgpack_is_not_offered_without_the_package(monkeypatch):
+    monkeypatch.setitem(sys.modules, "msgpack", None)
+    assert protocol.supported_subprotocols() == [protocol.STRUCT_SUBPROTOCOL]
+    assert protocol.negotiate([protocol.MSGPACK_SUBPROTOCOL]) == protocol.JSON
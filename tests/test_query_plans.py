@@ -0,0 +1,78 @@
+"""
+SQLite EXPLAIN QUERY PLAN of the statements the statistics code actually runs: each one
+must reach trips, detection_logs and daily_stats through an index, never a full scan.
+"""
+import asyncio
+import sqlite3
+from datetime import date, timedelta
+
+import crud
+import database
+import rollup
+from conftest import DB_PATH
+
+
+def _plans(queries, call) -> list:
+    """Run call(db), then EXPLAIN every statement it executed. Returns one list of plan lines per statement."""
+    async def run():
+        async with database.SessionLocal() as db:
+            await call(db)
+        await database.engine.dispose()
+
+    asyncio.run(run())
+    with sqlite3.connect(DB_PATH) as conn:
+        return [
+            [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + statement, parameters)]
+            for statement, parameters in queries
+            if statement.lstrip().upper().startswith("SELECT")
+        ]
+
+
+def _assert_no_scan(plan: list, *tables):
+    for table in tables:
+        assert not any(line.startswith(f"SCAN {table}") for line in plan), plan
+
+
+def test_trips_with_detection_counts(driver, queries):
+    plans = _plans(queries, lambda db: crud.get_trips_with_detection_counts(db, driver.user_id, limit=10))
+    assert len(plans) == 1
+    plan = plans[0]
+    _assert_no_scan(plan, "trips", "detection_logs")
+    assert any("ix_trips_user_id_start_time" in line for line in plan), plan
+    # Logs are counted per returned trip, not grouped over all of the user's logs into a derived table
+    assert any(line.startswith("CORRELATED SCALAR SUBQUERY") for line in plan), plan
+    assert not any(line.startswith(("MATERIALIZE", "CO-ROUTINE")) for line in plan), plan
+    assert any(line.startswith("SEARCH detection_logs") and "(trip_id=?)" in line for line in plan), plan
+
+
+def test_trip_logs(driver, queries):
+    plans = _plans(queries, lambda db: crud.get_trip_logs(db, trip_id=1))
+    plan = plans[0]
+    assert any("ix_detection_logs_trip_id_timestamp" in line for line in plan), plan
+    # The index already returns the logs in time order
+    assert not any("TEMP B-TREE FOR ORDER BY" in line for line in plan), plan
+
+
+def test_rollup_check(driver, queries):
+    plans = _plans(queries, lambda db: rollup.check(db, driver.user_id))
+    trip_plan, detection_plan, rollup_plan = plans
+    _assert_no_scan(trip_plan, "trips")
+    _assert_no_scan(detection_plan, "trips", "detection_logs")
+    assert any("ix_detection_logs_trip_id_event_type" in line for line in detection_plan), detection_plan
+    _assert_no_scan(rollup_plan, "daily_stats")
+
+
+def test_daily_rollup_ranges(driver, queries):
+    today = date.today()
+
+    async def call(db):
+        await crud.get_daily_trip_totals(db, driver.user_id, today - timedelta(days=30), today)
+        await crud.get_daily_detection_breakdown(db, driver.user_id, today - timedelta(days=30), today)
+        await crud.get_daily_driving_minutes(db, driver.user_id, {"week": today - timedelta(days=today.weekday())}, today)
+        await crud.get_daily_active_days(db, driver.user_id, today.replace(day=1), today)
+
+    plans = _plans(queries, call)
+    assert len(plans) == 4
+    for plan in plans:
+        # A range of the (user_id, day, event_type) primary key
+        assert any(line.startswith("SEARCH daily_stats") for line in plan), plan
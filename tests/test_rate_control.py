@@ -0,0 +1,48 @@
+"""recommend(): frame interval and size per driver situation and executor load."""
+import numpy as np
+import pytest
+
+from inference import rate_control
+from inference.rate_control import recommend
+from inference.results import Detections
+from inference.temporal import TemporalFilter
+
+NAMES = {0: "awake", 1: "distracted", 2: "drowsy", 3: "head drop", 4: "phone", 5: "smoking", 6: "yawn"}
+
+
+def driver(*labels):
+    """A temporal filter that saw one frame with these classes."""
+    flt = TemporalFilter(NAMES)
+    ids = [next(i for i, name in NAMES.items() if name == label) for label in labels]
+    flt.update(Detections(np.zeros((len(ids), 4), np.float32), np.full(len(ids), 0.9, np.float32), np.array(ids, np.int64)), now=0.0)
+    return flt
+
+
+@pytest.mark.parametrize("load", [0.0, 0.5, 1.0])
+def test_critical_drivers_get_the_fastest_rate_whatever_the_load(load):
+    assert recommend(driver("head drop"), load, 640) == {"interval_ms": rate_control.FRAME_INTERVAL_CRITICAL_MS, "resolution": 640}
+    flt = driver()
+    flt.status = "drowsy"
+    assert recommend(flt, load, 640)["interval_ms"] == rate_control.FRAME_INTERVAL_CRITICAL_MS
+
+
+def test_warning_drivers_slow_down_with_load_but_keep_full_size():
+    assert recommend(driver("phone"), 0.0, 640) == {"interval_ms": rate_control.FRAME_INTERVAL_WARNING_MS, "resolution": 640}
+    assert recommend(driver("phone"), 1.0, 640) == {"interval_ms": 2 * rate_control.FRAME_INTERVAL_WARNING_MS, "resolution": 640}
+    flt = driver()
+    flt.status = "yawn"
+    assert recommend(flt, 0.0, 640)["interval_ms"] == rate_control.FRAME_INTERVAL_WARNING_MS
+
+
+def test_awake_drivers_are_slowed_down_and_downsized_under_load():
+    assert recommend(driver("awake"), 0.0, 640) == {"interval_ms": rate_control.FRAME_INTERVAL_IDLE_MS, "resolution": 640}
+    busy = recommend(driver("awake"), rate_control.HIGH_LOAD, 640)
+    assert busy["interval_ms"] == int(rate_control.FRAME_INTERVAL_IDLE_MS * (1 + rate_control.HIGH_LOAD))
+    assert busy["resolution"] == 480
+    # Never slower than the cap
+    assert recommend(driver(), 1.0, 640)["interval_ms"] == rate_control.FRAME_INTERVAL_MAX_MS
+
+
+@pytest.mark.parametrize("imgsz, resolution", [(640, 480), (320, 224), (32, 32)])
+def test_downsized_frames_stay_stride_aligned(imgsz, resolution):
+    assert recommend(driver(), 1.0, imgsz)["resolution"] == resolution
@@ -0,0 +1,97 @@
+"""
+Vectorized result extraction: same output as the per-box loop the endpoints used
+before, checked on random ultralytics Results. Run it directly for a micro-benchmark:
+
+    python tests/test_results.py
+"""
+import numpy as np
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+import conftest  # sys.path, also when run as a script
+from inference.results import Detections, filter_detections, frame_status, from_ultralytics, status_levels, to_json
+
+NAMES = {0: "awake", 1: "distracted", 2: "drowsy", 3: "head drop", 4: "phone", 5: "smoking", 6: "yawn"}
+LEVELS = status_levels(NAMES)
+
+
+def _legacy_extract(r, names):
+    # The per-box loop the endpoints used before inference/results.py
+    detections = []
+    for box in r.boxes:
+        coords = box.xyxy[0].tolist()
+        conf = float(box.conf[0])
+        cls_id = int(box.cls[0])
+        detections.append({"label": names[cls_id], "confidence": round(conf, 2), "box": [int(x) for x in coords]})
+    detected_label = "awake"
+    for d in detections:
+        if d["label"] in ["drowsy", "head drop"]:
+            detected_label = d["label"]
+            break
+    if detected_label == "awake":
+        for d in detections:
+            if d["label"] in ["yawn", "phone", "distracted"]:
+                detected_label = d["label"]
+                break
+    return detected_label, detections
+
+
+def _vectorized(r, names=NAMES, levels=LEVELS):
+    det = from_ultralytics(r)
+    return frame_status(det, names, levels), to_json(det, names)
+
+
+def _results(num_boxes: int, seed: int = 0) -> Results:
+    generator = torch.Generator().manual_seed(seed)
+    boxes = torch.rand(num_boxes, 6, generator=generator)
+    boxes[:, :4] *= 640
+    boxes[:, 5] = torch.randint(0, len(NAMES), (num_boxes,), generator=generator)
+    return Results(np.zeros((640, 640, 3), np.uint8), path="", names=NAMES, boxes=boxes)
+
+
+def _detections(class_ids, scores) -> Detections:
+    return Detections(boxes=np.tile(np.array([[10.7, 20.2, 30.9, 40.5]], np.float32), (len(class_ids), 1)),
+                      scores=np.array(scores, np.float32), class_ids=np.array(class_ids, np.int64))
+
+
+@pytest.mark.parametrize("num_boxes", [0, 1, 5, 20, 100])
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_the_per_box_loop(num_boxes, seed):
+    r = _results(num_boxes, seed)
+    assert _vectorized(r) == _legacy_extract(r, NAMES)
+
+
+def test_frame_status_priority():
+    assert frame_status(_detections([], []), NAMES, LEVELS) == "awake"
+    # Unranked classes (awake, smoking) never set the status
+    assert frame_status(_detections([0, 5], [0.9, 0.8]), NAMES, LEVELS) == "awake"
+    # Critical beats a more confident warning; among equals the first (most confident) wins
+    assert frame_status(_detections([6, 3, 2], [0.9, 0.6, 0.5]), NAMES, LEVELS) == "head drop"
+    assert frame_status(_detections([4, 6], [0.7, 0.6]), NAMES, LEVELS) == "phone"
+
+
+def test_filter_detections():
+    det = _detections([2, 6, 4], [0.9, 0.4, 0.6])
+    assert filter_detections(det) is det
+    assert filter_detections(det, min_confidence=0.5).class_ids.tolist() == [2, 4]
+    assert filter_detections(det, class_ids=[6, 4]).class_ids.tolist() == [6, 4]
+    assert filter_detections(det, 0.5, [6, 4]).class_ids.tolist() == [4]
+
+
+def test_to_json():
+    assert to_json(_detections([2], [0.876]), NAMES) == [{"label": "drowsy", "confidence": 0.88, "box": [10, 20, 30, 40]}]
+
+
+def benchmark(num_boxes: int, repeat: int = 2000):
+    import timeit
+
+    r = _results(num_boxes)
+    before = timeit.timeit(lambda: _legacy_extract(r, NAMES), number=repeat) / repeat * 1e6
+    after = timeit.timeit(lambda: _vectorized(r), number=repeat) / repeat * 1e6
+    print(f"{num_boxes} boxes: per-box loop {before:.1f} us/frame, vectorized {after:.1f} us/frame ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    for n in (1, 5, 20, 100):
+        benchmark(n)
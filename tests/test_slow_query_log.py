@@ -0,0 +1,56 @@
+"""The slow-query log and per-request query stats of database.py / main.py."""
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import database
+import main
+import models
+from conftest import run
+
+
+def _slow_queries(output):
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{"event": "slow_query"')]
+
+
+@pytest.fixture
+def client(driver):
+    # Not entered as a context manager: the startup schema creation and model loading don't run
+    return TestClient(main.app)
+
+
+def test_statements_over_the_threshold_are_logged_with_the_request(client, monkeypatch, capsys):
+    monkeypatch.setattr(database, "DB_SLOW_QUERY_MS", 1e-6)
+    assert client.get("/ready").status_code == 200
+    logged = _slow_queries(capsys.readouterr().out)
+    assert len(logged) == 1
+    assert logged[0]["path"] == "GET /ready"
+    assert logged[0]["statement"] == "SELECT 1"
+    assert logged[0]["duration_ms"] >= 0
+    assert set(logged[0]) == {"event", "duration_ms", "path", "rows", "executemany", "statement"}
+
+
+@pytest.mark.parametrize("threshold", [0, 60_000])
+def test_fast_statements_and_a_disabled_log_print_nothing(client, monkeypatch, capsys, threshold):
+    monkeypatch.setattr(database, "DB_SLOW_QUERY_MS", threshold)
+    client.get("/ready")
+    assert _slow_queries(capsys.readouterr().out) == []
+
+
+def test_parameters_are_not_logged(driver, monkeypatch, capsys):
+    monkeypatch.setattr(database, "DB_SLOW_QUERY_MS", 1e-6)
+    run(lambda db: db.execute(select(models.User).where(models.User.email == "secret@example.com")))
+    logged = _slow_queries(capsys.readouterr().out)
+    assert logged[0]["path"] is None
+    assert "secret@example.com" not in json.dumps(logged)
+
+
+def test_query_stats_headers(client, monkeypatch):
+    response = client.get("/ready")
+    assert "X-DB-Queries" not in response.headers
+    monkeypatch.setattr(main, "DB_QUERY_STATS", True)
+    response = client.get("/ready")
+    assert response.headers["X-DB-Queries"] == "1"
+    assert float(response.headers["X-DB-Time-Ms"]) >= 0
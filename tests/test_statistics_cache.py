@@ -0,0 +1,81 @@
+"""Cached statistics responses: invalidated by every write, kept apart per user, revalidated with ETags."""
+import pytest
+
+from conftest import make_client
+from routers import statistics, trips
+
+
+@pytest.fixture
+def client(new_driver):
+    with make_client(new_driver(), statistics.router, trips.router) as client:
+        yield client
+
+
+def _summary(client) -> dict:
+    response = client.get("/statistics/summary")
+    assert response.status_code == 200
+    return response.json()
+
+
+def _log(key=None):
+    return {"event_type": "drowsy", "confidence": 0.9, "client_event_id": key}
+
+
+def test_writes_invalidate_the_summary(client):
+    assert _summary(client)["total_trips"] == 0
+
+    trip_id = client.post("/trips/start").json()["trip_id"]
+    assert _summary(client)["total_trips"] == 1
+
+    client.post(f"/trips/{trip_id}/logs", json=_log())
+    assert _summary(client)["total_detections"] == 1
+
+    client.post(f"/trips/{trip_id}/logs/batch", json=[_log("a"), _log("b")])
+    assert _summary(client)["total_detections"] == 3
+
+    client.post("/trips/detections", json=_log())
+    assert _summary(client)["total_detections"] == 4
+
+    client.post("/trips/end")
+    assert _summary(client)["recent_trips"][0]["status"] == "FINISHED"
+
+
+def test_replayed_batch_keeps_the_cache_valid(client, queries):
+    trip_id = client.post("/trips/start").json()["trip_id"]
+    client.post(f"/trips/{trip_id}/logs/batch", json=[_log("a")])
+    _summary(client)
+    # Nothing new stored: the cached summary is still right
+    client.post(f"/trips/{trip_id}/logs/batch", json=[_log("a")])
+    queries.clear()
+    assert _summary(client)["total_detections"] == 1
+    assert queries == []
+
+
+def test_cache_is_per_user(new_driver, queries):
+    with make_client(new_driver(), statistics.router, trips.router) as first, \
+            make_client(new_driver(), statistics.router, trips.router) as second:
+        assert _summary(first)["total_trips"] == 0
+        assert _summary(second)["total_trips"] == 0
+
+        second.post("/trips/start")
+        queries.clear()
+        # The first driver's entry survives the second driver's write, and is theirs alone
+        assert _summary(first)["total_trips"] == 0
+        assert queries == []
+        assert _summary(second)["total_trips"] == 1
+
+
+def test_if_none_match(client):
+    response = client.get("/statistics/summary")
+    etag = response.headers["etag"]
+
+    revalidated = client.get("/statistics/summary", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+
+    client.post("/trips/start")
+    changed = client.get("/statistics/summary", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["total_trips"] == 1
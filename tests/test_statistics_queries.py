@@ -0,0 +1,49 @@
+"""The statistics endpoints issue a fixed number of queries, whatever the number of trips."""
+import asyncio
+
+import pytest
+
+from cache import statistics_cache
+from conftest import TRIPS, make_client
+from routers import statistics
+
+
+@pytest.fixture
+def client(driver):
+    # Cached responses would hide the queries
+    asyncio.run(statistics_cache.invalidate(driver.user_id))
+    with make_client(driver, statistics.router) as client:
+        yield client
+
+
+def test_trips_is_one_query(client, queries):
+    response = client.get("/statistics/trips", params={"limit": TRIPS})
+    assert response.status_code == 200
+    trips = response.json()
+    assert len(trips) == TRIPS
+    assert all(trip["total_detections"] > 0 for trip in trips)
+    # Trips and their detection counts come from one grouped query, not one count per trip
+    assert len(queries) == 1
+
+
+def test_trips_with_period_is_one_query(client, queries):
+    response = client.get("/statistics/trips", params={"period": "THIS_YEAR"})
+    assert response.status_code == 200
+    assert len(queries) == 1
+
+
+def test_summary_queries(client, queries):
+    response = client.get("/statistics/summary")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total_trips"] == TRIPS
+    assert len(body["recent_trips"]) == 10
+    # Trip totals and the breakdown from the rollup, then the recent trips with their counts
+    assert len(queries) == 3
+
+
+def test_summary_is_cached(client, queries):
+    assert client.get("/statistics/summary").status_code == 200
+    queries.clear()
+    assert client.get("/statistics/summary").status_code == 200
+    assert len(queries) == 0
@@ -0,0 +1,40 @@
+"""Stream alerts follow the driver's active trip while the WebSocket stays open."""
+import asyncio
+
+import crud
+import database
+from conftest import run
+from log_buffer import DetectionLogBuffer, StreamEventLogger
+
+
+def test_logs_follow_the_active_trip(new_driver, monkeypatch):
+    driver = new_driver()
+    first = run(lambda db: crud.create_trip(db, driver.user_id)).trip_id
+    # Look the trip up on every alert rather than every few seconds
+    monkeypatch.setattr(StreamEventLogger, "TRIP_CHECK_S", 0)
+
+    async def main():
+        buffer = DetectionLogBuffer()
+        logger = StreamEventLogger(buffer, driver.user_id, first)
+        assert await logger.record("drowsy", 0.9)
+        # Repeated status: nothing new to log
+        assert not await logger.record("drowsy", 0.9)
+
+        async with database.SessionLocal() as db:
+            await crud.end_trip(db, first)
+        # The stream is still open, but there is no trip to log to
+        assert not await logger.record("yawn", 0.8)
+        assert logger.trip_id is None
+
+        async with database.SessionLocal() as db:
+            second = (await crud.create_trip(db, driver.user_id)).trip_id
+        assert await logger.record("phone", 0.7)
+        assert logger.trip_id == second
+        await buffer.flush()
+        await database.engine.dispose()
+        return second
+
+    second = asyncio.run(main())
+    assert [log.event_type for log in run(lambda db: crud.get_trip_logs(db, first))] == ["drowsy"]
+    assert [log.event_type for log in run(lambda db: crud.get_trip_logs(db, second))] == ["phone"]
+
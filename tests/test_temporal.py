@@ -0,0 +1,100 @@
+"""TemporalFilter: hold times, PERCLOS and voting over a time window."""
+import numpy as np
+import pytest
+
+from inference import temporal
+from inference.results import Detections
+from inference.temporal import TemporalFilter
+
+NAMES = {0: "awake", 1: "distracted", 2: "drowsy", 3: "head drop", 4: "phone", 5: "smoking", 6: "yawn"}
+LABELS = {label: i for i, label in NAMES.items()}
+
+
+def det(*labels, score=0.8):
+    return Detections(boxes=np.zeros((len(labels), 4), np.float32), scores=np.full(len(labels), score, np.float32),
+                      class_ids=np.array([LABELS[label] for label in labels], np.int64))
+
+
+def feed(flt, frames, fps, start=0.0):
+    """Feed (labels, ...) per frame at a fixed rate; returns [(time, status)] and the next frame time."""
+    statuses = []
+    for i, labels in enumerate(frames):
+        now = round(start + i / fps, 6)
+        statuses.append((now, flt.update(det(*labels), now)))
+    return statuses, round(start + len(frames) / fps, 6)
+
+
+def first_time(statuses, status):
+    return next(now for now, s in statuses if s == status)
+
+
+def test_critical_status_is_reported_after_its_hold_time():
+    flt = TemporalFilter(NAMES)
+    statuses, _ = feed(flt, [("drowsy",)] * 10, fps=10)
+    assert first_time(statuses, "drowsy") == pytest.approx(temporal.CRITICAL_HOLD_S)
+    assert all(s == "awake" for now, s in statuses if now < temporal.CRITICAL_HOLD_S)
+
+
+def test_a_single_frame_does_not_change_the_status():
+    flt = TemporalFilter(NAMES)
+    _, start = feed(flt, [()] * 20, fps=10)
+    statuses, _ = feed(flt, [("drowsy",)] + [()] * 20, fps=10, start=start)
+    assert {s for _, s in statuses} == {"awake"}
+
+
+def test_a_new_candidate_restarts_the_hold():
+    flt = TemporalFilter(NAMES)
+    # "head drop" is the candidate for 0.2 s, less than its hold, then "drowsy" takes over
+    statuses, _ = feed(flt, [("head drop",)] * 2 + [("head drop", "drowsy")] * 8, fps=10)
+    assert "head drop" not in {s for _, s in statuses}
+    assert first_time(statuses, "drowsy") == pytest.approx(0.2 + temporal.CRITICAL_HOLD_S)
+
+
+@pytest.mark.parametrize("every, drowsy", [(3, True), (4, False)])
+def test_perclos_threshold(every, drowsy):
+    flt = TemporalFilter(NAMES)
+    frames = [("drowsy",) if i % every == 0 else () for i in range(100)]
+    statuses, _ = feed(flt, frames, fps=10)
+    # Once the window is full, a third of the frames is above PERCLOS_THRESHOLD and a quarter is below
+    assert (statuses[-1][1] == "drowsy") is drowsy
+    assert flt.perclos == pytest.approx(1 / every, abs=0.05)
+
+
+@pytest.mark.parametrize("fps", [5, 10, 30])
+def test_warning_and_recovery_hold_times_do_not_depend_on_frame_rate(fps):
+    flt = TemporalFilter(NAMES)
+    _, start = feed(flt, [()] * (2 * fps), fps=fps)
+    statuses, next_start = feed(flt, [("yawn",)] * (4 * fps), fps=fps, start=start)
+    # The yawn vote crosses VOTE_THRESHOLD half a window in, then the warning hold starts
+    expected = start + temporal.VOTE_THRESHOLD * temporal.TEMPORAL_WINDOW_S + temporal.WARNING_HOLD_S
+    assert first_time(statuses, "yawn") == pytest.approx(expected, abs=1.5 / fps)
+
+    statuses, _ = feed(flt, [()] * (4 * fps), fps=fps, start=next_start)
+    expected = next_start + temporal.VOTE_THRESHOLD * temporal.TEMPORAL_WINDOW_S + temporal.RECOVER_HOLD_S
+    assert first_time(statuses, "awake") == pytest.approx(expected, abs=1.5 / fps)
+
+
+def test_priority_between_candidates():
+    flt = TemporalFilter(NAMES)
+    statuses, start = feed(flt, [("yawn", "head drop")] * 10, fps=10)
+    assert statuses[-1][1] == "head drop"
+    statuses, _ = feed(flt, [("yawn", "head drop", "drowsy")] * 10, fps=10, start=start)
+    assert statuses[-1][1] == "drowsy"
+
+
+def test_window_drops_old_frames():
+    flt = TemporalFilter(NAMES)
+    feed(flt, [("phone",)] * 10, fps=10)
+    assert flt.seen(["phone"])
+    flt.update(det(), now=10.0)
+    assert not flt.seen(["phone"])
+    assert flt.votes.sum() == 0
+
+
+def test_confidence_is_smoothed():
+    flt = TemporalFilter(NAMES)
+    flt.update(det("yawn", "yawn", score=0.8), now=0.0)
+    assert flt.confidence("yawn") == pytest.approx(temporal.TEMPORAL_EMA_ALPHA * 0.8)
+    flt.update(det(), now=0.1)
+    assert flt.confidence("yawn") == pytest.approx((1 - temporal.TEMPORAL_EMA_ALPHA) * temporal.TEMPORAL_EMA_ALPHA * 0.8)
+    assert flt.confidence("seatbelt") == 0.0
@@ -0,0 +1,153 @@
+"""Inference over the transport: the in-process "local" transport, a unix socket node, and losing a node."""
+import asyncio
+
+import numpy as np
+import pytest
+
+from conftest import FakeExecutor
+from inference import transport
+from inference.transport import InferenceServer, InferenceUnavailable, RemoteInferenceClient, StreamChannel
+from routers import ai_detection
+
+FRAMES = [b"frame-1", b"not an image", b"a longer frame"]
+
+
+def _assert_detections(results):
+    assert len(results) == len(FRAMES)
+    for frame, det in zip(FRAMES, results):
+        expected = FakeExecutor.detections(frame)
+        if expected is None:
+            assert det is None
+        else:
+            np.testing.assert_array_equal(det.boxes, expected.boxes)
+            np.testing.assert_array_equal(det.scores, expected.scores)
+            np.testing.assert_array_equal(det.class_ids, expected.class_ids)
+
+
+async def _wait_for(condition, timeout: float = 5):
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+def test_local_transport_in_the_ai_router(monkeypatch):
+    fake = FakeExecutor()
+    monkeypatch.setattr(ai_detection, "INFERENCE_TRANSPORT", "local")
+    monkeypatch.setattr(ai_detection, "INFERENCE_WARMUP_RUNS", 0)
+    monkeypatch.setattr(ai_detection, "_create_executor", lambda: fake)
+    for name in ("executor", "scheduler", "status_levels", "model_state"):
+        monkeypatch.setattr(ai_detection, name, getattr(ai_detection, name))
+
+    async def main():
+        await ai_detection._load_model()
+        try:
+            assert isinstance(ai_detection.executor, RemoteInferenceClient)
+            assert (await ai_detection.ready())["transport"] == "local"
+            assert ai_detection.executor.names == fake.names
+            _assert_detections(await ai_detection.executor.decode_and_detect_batch(FRAMES))
+            # Frames submitted together reach the model as one batch, through the transport
+            _assert_detections(await asyncio.gather(*(ai_detection.scheduler.submit(frame) for frame in FRAMES)))
+            assert fake.batches[-1] == FRAMES
+        finally:
+            await ai_detection.scheduler.stop()
+            ai_detection.executor.shutdown()
+
+    asyncio.run(main())
+    assert fake.closed
+
+
+def test_unix_socket_node(tmp_path):
+    url = f"unix://{tmp_path}/node.sock"
+
+    async def main():
+        server = await InferenceServer(FakeExecutor(workers=2)).listen(url)
+        client = RemoteInferenceClient(url)
+        try:
+            await client.start()
+            assert client.connected
+            assert client.workers == 2
+            _assert_detections(await client.decode_and_detect_batch(FRAMES))
+            assert client.pending == 0
+        finally:
+            client.shutdown()
+            server.close()
+
+    asyncio.run(main())
+
+
+async def _fake_node(url: str, on_request):
+    """
+    A node that says hello like InferenceServer, then hands each request to
+    on_request(channel, request, connection), connection counting from 1.
+    """
+    connections = []
+
+    async def on_connect(reader, writer):
+        channel = StreamChannel(reader, writer)
+        connections.append(channel)
+        number = len(connections)
+        await channel.send(InferenceServer(FakeExecutor()).hello())
+        try:
+            while True:
+                await on_request(channel, await channel.recv(), number)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    server = await asyncio.start_unix_server(on_connect, path=url[len("unix://"):])
+    return server, connections
+
+
+def test_node_lost_mid_request(tmp_path):
+    url = f"unix://{tmp_path}/node.sock"
+
+    async def drop(channel, request, connection):
+        # The node dies with the request in flight
+        channel.close()
+
+    async def main():
+        server, _ = await _fake_node(url, drop)
+        client = RemoteInferenceClient(url)
+        try:
+            await client.start()
+            with pytest.raises(InferenceUnavailable):
+                await client.decode_and_detect_batch(FRAMES)
+            assert client.pending == 0
+            server.close()
+            await server.wait_closed()
+            # Nobody to reconnect to: frames are refused right away instead of waiting
+            await _wait_for(lambda: not client.connected)
+            with pytest.raises(InferenceUnavailable):
+                await client.decode_and_detect_batch(FRAMES)
+        finally:
+            client.shutdown()
+
+    asyncio.run(main())
+
+
+def test_reconnects_after_a_malformed_reply(tmp_path, monkeypatch):
+    url = f"unix://{tmp_path}/node.sock"
+    monkeypatch.setattr(transport, "INFERENCE_RECONNECT_MAX_S", 0.1)
+
+    async def reply(channel, request, connection):
+        if connection == 1:
+            # An unhashable id: a TypeError in the client's reply handling
+            await channel.send({"id": [request["id"]], "load": 0.0})
+        else:
+            detections = [transport.pack_detections(FakeExecutor.detections(frame)) for frame in request["frames"]]
+            await channel.send({"id": request["id"], "load": 0.0, "detections": detections})
+
+    async def main():
+        server, connections = await _fake_node(url, reply)
+        client = RemoteInferenceClient(url, timeout=1)
+        try:
+            await client.start()
+            with pytest.raises(InferenceUnavailable):
+                await client.decode_and_detect_batch(FRAMES)
+            # The client dropped the connection and came back instead of giving up on the node
+            await _wait_for(lambda: client.connected and len(connections) == 2)
+            _assert_detections(await client.decode_and_detect_batch(FRAMES))
+        finally:
+            client.shutdown()
+            server.close()
+
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""Model warm-up: what it runs, and that the model is only reported ready afterwards."""
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from conftest import FakeExecutor
+from inference import warmup
+from inference.batching import INFERENCE_MAX_BATCH
+from inference.warmup import warm_up
+from routers import ai_detection
+
+
+def test_every_worker_runs_each_size_and_batch():
+    fake = FakeExecutor(workers=2)
+    timings = asyncio.run(warm_up(fake, runs=2))
+    assert [(t["size"], t["batch"], len(t["ms"])) for t in timings] == [
+        ("640x480", 1, 2), ("640x480", INFERENCE_MAX_BATCH, 2), ("480x640", 1, 2), ("480x640", INFERENCE_MAX_BATCH, 2),
+    ]
+    # sizes x batches x runs x workers
+    assert len(fake.batches) == 2 * 2 * 2 * 2
+    frame = fake.batches[0][0]
+    assert cv2.imdecode(np.frombuffer(frame, np.uint8), cv2.IMREAD_COLOR).shape == (480, 640, 3)
+
+
+def test_configured_sizes_and_batches(monkeypatch):
+    monkeypatch.setattr(warmup, "INFERENCE_WARMUP_SIZES", "320x240,1280X720")
+    monkeypatch.setattr(warmup, "INFERENCE_WARMUP_BATCHES", "3")
+    fake = FakeExecutor()
+    timings = asyncio.run(warm_up(fake, runs=1))
+    assert [(t["size"], t["batch"]) for t in timings] == [("320x240", 3), ("1280x720", 3)]
+    assert [len(batch) for batch in fake.batches] == [3, 3]
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    """_load_model with a fake executor; the router's globals are restored afterwards."""
+    for name in ("executor", "scheduler", "status_levels", "model_state", "warmup_timings"):
+        monkeypatch.setattr(ai_detection, name, getattr(ai_detection, name))
+    monkeypatch.setattr(ai_detection, "executor", None)
+    monkeypatch.setattr(ai_detection, "model_state", "loading")
+    monkeypatch.setattr(ai_detection, "INFERENCE_TRANSPORT", "")
+    monkeypatch.setattr(ai_detection, "INFERENCE_WARMUP_RUNS", 1)
+
+    def use(fake):
+        monkeypatch.setattr(ai_detection, "_create_executor", lambda: fake)
+        return fake
+
+    return use
+
+
+def test_model_is_ready_only_after_warm_up(loader):
+    fake = loader(FakeExecutor())
+
+    async def main():
+        fake.gate = asyncio.Event()
+        task = asyncio.create_task(ai_detection._load_model())
+        while not fake.batches:
+            await asyncio.sleep(0.01)
+        # Warm-up frames are running: not published to the handlers yet
+        assert ai_detection.model_state == "warming"
+        assert ai_detection.executor is None
+        assert (await ai_detection.ready()).status_code == 503
+        fake.gate.set()
+        await task
+        assert ai_detection.model_state == "ready"
+        assert ai_detection.executor is fake
+        body = await ai_detection.ready()
+        assert body["model"] == "ready"
+        assert len(body["warmup"]) == 4
+        await ai_detection.scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_failed_warm_up_still_publishes_the_model(loader, capsys):
+    class Failing(FakeExecutor):
+        async def decode_and_detect_batch(self, frames):
+            raise RuntimeError("out of memory")
+
+    fake = loader(Failing())
+
+    async def main():
+        await ai_detection._load_model()
+        await ai_detection.scheduler.stop()
+
+    asyncio.run(main())
+    assert ai_detection.model_state == "ready"
+    assert ai_detection.executor is fake
+    assert "Model warm-up failed: out of memory" in capsys.readouterr().out
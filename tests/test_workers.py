@@ -0,0 +1,97 @@
+"""ProcessInferencePool with a tiny ONNX model: startup failures and restarting a worker that died."""
+import asyncio
+import multiprocessing
+
+import cv2
+import numpy as np
+import onnx
+import pytest
+from onnx import TensorProto, helper
+
+from conftest import FakeExecutor
+from inference.workers import ProcessInferencePool
+
+IMGSZ = 64
+
+
+def _write_model(path):
+    # (N, 3, 64, 64) -> (N, 4 + classes, 2): the image mean times constant predictions,
+    # i.e. the output layout of an exported YOLO model
+    classes = len(FakeExecutor.names)
+    predictions = np.zeros((4 + classes, 2), np.float32)
+    predictions[:4] = [[20, 40], [20, 40], [10, 10], [10, 10]]  # cx, cy, w, h
+    predictions[4 + 1] = 1.0  # class 1 with the mean as its score
+    graph = helper.make_graph(
+        [
+            helper.make_node("ReduceMean", ["images"], ["mean"], axes=[1, 2, 3], keepdims=1),
+            helper.make_node("Mul", ["mean", "predictions"], ["scaled"]),
+            helper.make_node("Reshape", ["scaled", "shape"], ["output0"]),
+        ],
+        "tiny",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["batch", 3, IMGSZ, IMGSZ])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, ["batch", 4 + classes, 2])],
+        [
+            helper.make_tensor("predictions", TensorProto.FLOAT, predictions.shape, predictions.flatten()),
+            helper.make_tensor("shape", TensorProto.INT64, [3], [-1, 4 + classes, 2]),
+        ],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    helper.set_model_props(model, {"names": repr(FakeExecutor.names)})
+    onnx.save(model, str(path))
+
+
+@pytest.fixture
+def onnx_model(tmp_path, monkeypatch):
+    path = tmp_path / "tiny.onnx"
+    _write_model(path)
+    # Read by the spawned workers when they import inference.backends
+    monkeypatch.setenv("ONNX_MODEL_PATH", str(path))
+    return path
+
+
+def _frame(value: int) -> bytes:
+    return cv2.imencode(".png", np.full((48, 64, 3), value, np.uint8))[1].tobytes()
+
+
+def test_failed_startup_stops_the_other_workers(onnx_model, monkeypatch):
+    start_process = ProcessInferencePool._start_process
+
+    def second_worker_fails(pool, index):
+        pool._backend = "onnx" if index == 0 else "no-such-backend"
+        return start_process(pool, index)
+
+    monkeypatch.setattr(ProcessInferencePool, "_start_process", second_worker_fails)
+    # The first worker loads its model and would wait for its ring forever
+    with pytest.raises(RuntimeError, match="could not load the model"):
+        ProcessInferencePool("onnx", processes=2)
+    assert multiprocessing.active_children() == []
+
+
+def test_dead_worker_is_restarted(onnx_model):
+    pool = ProcessInferencePool("onnx", processes=1, slots=4)
+
+    async def main():
+        assert pool.names == FakeExecutor.names
+        det = await pool.decode_and_detect(_frame(255))
+        assert det.class_ids.tolist() == [1, 1]
+
+        worker = pool._workers[0]
+        worker.process.kill()
+        # Frames fail until the new process is up, then the pool works again
+        async with asyncio.timeout(60):
+            while True:
+                try:
+                    det = await pool.decode_and_detect(_frame(255))
+                    break
+                except RuntimeError:
+                    await asyncio.sleep(0.2)
+        assert det.class_ids.tolist() == [1, 1]
+        assert worker.process.is_alive()
+        assert len(worker.free) == pool.slots
+
+    try:
+        asyncio.run(main())
+    finally:
+        pool.shutdown()
+    assert multiprocessing.active_children() == []